@@ -0,0 +1,36 @@
+"""
+Payload size and time for line plots with and without max_points.
+
+Run with: python benchmarks/bench_downsample.py [series] [samples]
+"""
+
+import json
+import sys
+import time
+
+from numpy import random
+
+from lightning.types.plots import Line
+
+
+def payload(series, **kwargs):
+    start = time.time()
+    data = Line._format_data(Line.clean(series, **kwargs))
+    body = json.dumps({'data': data})
+    return time.time() - start, len(body)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    m = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    random.seed(0)
+    series = random.randn(n, m).cumsum(axis=1)
+
+    elapsed, size = payload(series)
+    print('%-28s %8.2f s  %12d bytes' % ('full (%d x %d)' % (n, m), elapsed, size))
+
+    for method in ('lttb', 'minmax'):
+        for max_points in (1000, 4000):
+            t, b = payload(series, max_points=max_points, downsample=method)
+            print('%-28s %8.2f s  %12d bytes  (%.0fx smaller, %.1fx faster)'
+                  % ('%s max_points=%d' % (method, max_points), t, b, size / float(b), elapsed / t))
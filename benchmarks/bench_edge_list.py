@@ -0,0 +1,40 @@
+"""
+Peak memory to build and serialize force graphs from memory-mapped edge lists.
+
+Run with: python benchmarks/bench_edge_list.py [edges ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from numpy import random, save
+
+from lightning.types.plots import Force
+from lightning.visualization import json_body
+
+
+def measure(path):
+    tracemalloc.start()
+    start = time.time()
+    data = Force._format_data(Force.clean(path))
+    nbytes = sum(len(chunk) for chunk in json_body({'data': data}))
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, nbytes, peak
+
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1:]] or [1000000, 4000000, 16000000]
+    random.seed(0)
+    path = os.path.join(tempfile.mkdtemp(), 'edges.npy')
+
+    for n in sizes:
+        save(path, random.randint(0, 100000, size=(n, 2)).astype('int32'))
+        elapsed, nbytes, peak = measure(path)
+        print('%-16s %8.2f s  %8.0f MB body  %8.1f MB peak'
+              % ('%d edges' % n, elapsed, nbytes / 1e6, peak / 1e6))
+        os.remove(path)
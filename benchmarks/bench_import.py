@@ -0,0 +1,36 @@
+"""
+Measure the time to 'import lightning' in a fresh interpreter,
+and list the slowest modules it imports.
+
+Run with: python benchmarks/bench_import.py
+"""
+
+import subprocess
+import sys
+
+
+def cold_import(code, repeat=5):
+    cmd = [sys.executable, '-c', 'import time; t = time.time(); %s; print(time.time() - t)' % code]
+    return min(float(subprocess.check_output(cmd)) for _ in range(repeat))
+
+
+def slowest(code, n=10):
+    err = subprocess.check_output([sys.executable, '-X', 'importtime', '-c', code],
+                                  stderr=subprocess.STDOUT).decode('utf-8')
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:n]
+
+
+if __name__ == '__main__':
+    for code in ['import lightning',
+                 'import lightning; lightning._load_types()']:
+        print('%-50s %8.1f ms' % (code, cold_import(code) * 1000))
+
+    print('\nslowest modules for import lightning (cumulative us)')
+    for cumulative, name in slowest('import lightning'):
+        print('%10d  %s' % (cumulative, name))
@@ -0,0 +1,36 @@
+"""
+Time to build force graph links from a scipy.sparse matrix.
+
+Run with: python benchmarks/bench_sparse_graph.py [nodes] [degree]
+"""
+
+import sys
+import time
+
+from numpy import random
+from scipy import sparse
+
+from lightning.types.plots import Force
+
+
+def build(conn, encoding):
+    start = time.time()
+    links = Force.clean(conn)['links']
+    Force._format_data({'links': links}, encoding=encoding)
+    return time.time() - start, len(links)
+
+
+if __name__ == '__main__':
+    sizes = [int(sys.argv[1])] if len(sys.argv) > 1 else [100000, 1000000]
+    degree = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    random.seed(0)
+    for n in sizes:
+        nnz = n * degree
+        coo = sparse.coo_matrix((random.rand(nnz), (random.randint(0, n, nnz), random.randint(0, n, nnz))),
+                                shape=(n, n))
+        for fmt in ('coo', 'csr'):
+            for encoding in ('json', 'binary'):
+                elapsed, nlinks = build(coo.asformat(fmt), encoding)
+                print('%-32s %8.2f s  %10d links  (dense would be %.0f GB)'
+                      % ('%s %s %d nodes' % (fmt, encoding, n), elapsed, nlinks, n * n * 8 / 1e9))
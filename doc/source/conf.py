@@ -71,6 +71,7 @@ copyright = u'2014, Matthew Conlen and Jeremy Freeman'
 # The short X.Y version.
 sys.path.insert(0, os.path.abspath(os.path.pardir))
 import lightning
+lightning._load_types()
 version = lightning.__version__
 # The full version, including alpha/beta/rc tags.
 release = lightning.__version__
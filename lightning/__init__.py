@@ -1,9 +1,51 @@
+import sys
+
 from .main import Lightning
 from .session import Session
-from .visualization import Visualization, VisualizationLocal
-from .types.plots import *
-from .types.images import *
-from .types.streaming import *
-from .types.three import *
+from .visualization import Visualization, VisualizationLocal, save_dashboard
+from .transport import Transport
+from .spool import SpoolTransport
 
 __version__ = "1.2.1"
+
+# plot type modules are imported on first use, since they pull in numpy
+# and register the plotting methods on Lightning as a side effect
+_type_modules = ['plots', 'images', 'streaming', 'three']
+
+_types = []
+
+
+def _load_types():
+    """
+    Import the plot type modules, registering plotting methods on Lightning.
+    """
+    if not _types:
+        from importlib import import_module
+        modules = [import_module('lightning.types.' + name) for name in _type_modules]
+        _types.extend(modules)
+    return _types
+
+
+def __getattr__(name):
+    # lazy module attributes (Python 3.7+), e.g. lightning.Scatter
+    if name == 'AsyncLightning':
+        from .aio import AsyncLightning
+        return AsyncLightning
+    if name == '__all__':
+        # from lightning import * still brings in the plot types
+        names = ['Lightning', 'Session', 'Visualization', 'VisualizationLocal', 'save_dashboard',
+                 'Transport', 'SpoolTransport']
+        for module in _load_types():
+            names.extend(k for k in vars(module) if not k.startswith('_') and k not in names)
+        return names
+    if name.startswith('__'):
+        raise AttributeError(name)
+    for module in _load_types():
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise AttributeError("module 'lightning' has no attribute '%s'" % name)
+
+
+if sys.version_info < (3, 7):
+    for _module in _load_types():
+        globals().update((k, v) for (k, v) in vars(_module).items() if not k.startswith('_'))
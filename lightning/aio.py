@@ -0,0 +1,402 @@
+"""
+asyncio client for lightning, requires Python 3.5+ and aiohttp.
+
+Plotting methods are generated from the same plot type registry used by
+Lightning, so every synchronous lgn.<type>(...) call has an awaitable
+counterpart on AsyncLightning. Example:
+
+    async with AsyncLightning(host) as lgn:
+        viz = await lgn.line(series)
+        await viz.append(more)
+"""
+
+import asyncio
+import inspect
+import json
+from functools import partial
+
+from lightning import Lightning, _load_types
+from lightning.types.decorators import REGISTRY, SIZES
+from lightning.session import Session
+from lightning.visualization import packed_header, iter_json
+
+
+def _require_aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("AsyncLightning requires aiohttp, install with 'pip install aiohttp'")
+    return aiohttp
+
+
+class AsyncLightning(object):
+    """
+    Lightning client for use inside an asyncio event loop.
+
+    Parameters
+    ----------
+    host : str, optional, default="http://localhost:3000"
+        Address of the lightning server
+
+    auth : tuple, optional, default=None
+        Username and password for basic authentication
+
+    size : str, optional, default='full'
+        Figure size, one of 'small', 'medium', 'large', 'full'
+
+    limit : int, optional, default=10
+        Maximum number of simultaneous connections to the server
+    """
+
+    local_enabled = False
+    ipython_enabled = False
+
+    # requests are made with an aiohttp client instead of a Transport
+    transport = None
+
+    def __init__(self, host="http://localhost:3000", auth=None, size='full', limit=10):
+        self.set_host(host)
+        self.auth = auth
+        self.set_size(size)
+        self.encoding = 'json'
+        self.limit = limit
+        self.session = None
+        self._client = None
+        self._session_lock = None
+
+    def __repr__(self):
+        s = 'AsyncLightning\n'
+        s += 'host: %s\n' % self.host
+        if self.session is not None:
+            s += 'session: %s\n' % self.session.id
+        return s
+
+    def __getattr__(self, name):
+        # plot types registered after this module was imported
+        if name.startswith('_') or name not in REGISTRY:
+            raise AttributeError(name)
+        _add_plotter(name, REGISTRY[name])
+        return getattr(self, name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    set_host = Lightning.set_host
+    set_size = Lightning.set_size
+    set_encoding = Lightning.set_encoding
+
+    def _get_client(self):
+        if self._client is None:
+            aiohttp = _require_aiohttp()
+            connector = aiohttp.TCPConnector(limit=self.limit)
+            auth = None
+            if isinstance(self.auth, tuple):
+                auth = aiohttp.BasicAuth(self.auth[0], self.auth[1])
+            self._client = aiohttp.ClientSession(connector=connector, auth=auth)
+        return self._client
+
+    async def _request(self, method, url, **kwargs):
+        client = self._get_client()
+        async with client.request(method, url, **kwargs) as r:
+            body = await r.read()
+            return r.status, body
+
+    async def close(self):
+        """
+        Close all connections to the server.
+        """
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def check_status(self):
+        """
+        Check the server for status
+        """
+        aiohttp = _require_aiohttp()
+        try:
+            status, _ = await self._request('GET', self.host + '/status')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+        return status == 200
+
+    async def create_session(self, name=None):
+        """
+        Create a lightning session.
+        """
+        payload = {}
+        if name:
+            payload = {'name': name}
+
+        headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
+        _, body = await self._request('POST', self.host + '/sessions/',
+                                      data=json.dumps(payload), headers=headers)
+        self.session = Session(lgn=self, json=json.loads(body.decode('utf-8')))
+        return self.session
+
+    def use_session(self, session_id):
+        """
+        Use the specified lightning session.
+        """
+        self.session = Session(lgn=self, id=session_id)
+        return self.session
+
+    async def _ensure_session(self):
+        if self._session_lock is None:
+            self._session_lock = asyncio.Lock()
+        async with self._session_lock:
+            if self.session is None:
+                await self.create_session()
+        return self.session
+
+    async def _plot(self, VizType, type, args, kwargs):
+
+        session = await self._ensure_session()
+
+        options, description = VizType._clean_options(**kwargs)
+        data = await _in_executor(_clean_data, VizType, self.encoding, args, {})
+
+        if 'packed' in data:
+            viz = await AsyncVisualization._create(session, VizType, type, packed=data['packed'],
+                                                   options=options, description=description)
+
+        elif 'images' in data and len(data) > 1:
+            images = data.pop('images')
+            viz = await AsyncVisualization._create(session, VizType, type, data=data,
+                                                   options=options, description=description)
+            for image in images:
+                await viz._send_image('POST', image)
+
+        elif 'images' in data:
+            viz = await AsyncVisualization._create(session, VizType, type, images=data['images'],
+                                                   options=options, description=description)
+
+        else:
+            viz = await AsyncVisualization._create(session, VizType, type, data=data,
+                                                   options=options, description=description)
+
+        session.visualizations.append(viz)
+        return viz
+
+
+class AsyncVisualization(object):
+    """
+    A visualization created with AsyncLightning, with awaitable methods.
+    """
+
+    def __init__(self, session=None, json=None, viztype=None):
+        self.session = session
+        self.id = json.get('id')
+        self.viztype = viztype
+
+    def __repr__(self):
+        return 'AsyncVisualization\nid: %s\ntype: %s\n' % (self.id, self.viztype._name)
+
+    @property
+    def _lgn(self):
+        return self.session.lgn
+
+    def _url(self, suffix=''):
+        url = self.session.host + '/sessions/' + str(self.session.id) + '/visualizations/' + str(self.id) + suffix
+        return self._format_url(url)
+
+    def _format_url(self, url):
+        from urllib.parse import quote
+        if not url.endswith('/'):
+            url += '/'
+        return url + '?host=' + quote(self.session.host)
+
+    def get_permalink(self):
+        return self.session.host + '/visualizations/' + str(self.id)
+
+    async def _clean(self, *args, **kwargs):
+        return await _in_executor(_clean_data, self.viztype, self._lgn.encoding, args, kwargs)
+
+    async def _send_data(self, method, data):
+        headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
+        return await self._lgn._request(method, self._url('/data/'),
+                                        data=''.join(iter_json({'data': data})), headers=headers)
+
+    async def _send_packed(self, method, packed):
+        aiohttp = _require_aiohttp()
+        form = aiohttp.FormData()
+        form.add_field('type', 'packed')
+        form.add_field('packed', json.dumps(packed_header(packed)))
+        form.add_field('file', packed['data'], filename='packed', content_type='application/octet-stream')
+        return await self._lgn._request(method, self._url('/data/images'), data=form)
+
+    async def _send_image(self, method, image):
+        aiohttp = _require_aiohttp()
+        form = aiohttp.FormData()
+        form.add_field('type', 'image')
+        form.add_field('file', image, filename='file', content_type='application/octet-stream')
+        return await self._lgn._request(method, self._url('/data/images'), data=form)
+
+    async def update(self, *args, **kwargs):
+        """
+        Update the data in the visualization.
+        """
+        data = await self._clean(*args, **kwargs)
+        if 'packed' in data:
+            await self._send_packed('PUT', data['packed'])
+        elif 'images' in data:
+            images = data.pop('images')
+            if data:
+                # metadata sent alongside the images at creation, e.g. shape and labels
+                await self._send_data('PUT', data)
+            for img in images:
+                await self._send_image('PUT', img)
+        else:
+            await self._send_data('PUT', data)
+
+    async def append(self, *args, **kwargs):
+        """
+        Append data to the visualization.
+        """
+        data = await self._clean(*args, **kwargs)
+        if 'packed' in data:
+            await self._send_packed('POST', data['packed'])
+        elif 'images' in data:
+            for img in data['images']:
+                await self._send_image('POST', img)
+        else:
+            await self._send_data('POST', data)
+
+    async def get_user_data(self):
+        """
+        Retrieve user data (e.g. selections) from the visualization.
+        """
+        status, body = await self._lgn._request('GET', self._url('/settings/'))
+        if status != 200:
+            raise Exception('Error retrieving user data from server')
+        return json.loads(body.decode('utf-8'))
+
+    async def get_html(self):
+        _, body = await self._lgn._request('GET', self._format_url(self.get_permalink() + '/embed'))
+        return body.decode('utf-8')
+
+    async def delete(self):
+        return await self._lgn._request('DELETE', self.get_permalink())
+
+    @classmethod
+    async def _create(cls, session, viztype, type, data=None, images=None, packed=None,
+                      options=None, description=None):
+
+        aiohttp = _require_aiohttp()
+
+        if options is None:
+            options = {}
+
+        url = session.host + '/sessions/' + str(session.id) + '/visualizations'
+
+        # images may be a generator still encoding later images
+        first_image = None
+        if images is not None:
+            images = iter(images)
+            first_image = next(images, None)
+
+        if packed is not None:
+            form = aiohttp.FormData()
+            form.add_field('type', type)
+            form.add_field('options', json.dumps(options))
+            form.add_field('packed', json.dumps(packed_header(packed)))
+            if description:
+                form.add_field('description', description)
+            form.add_field('file', packed['data'], filename='packed', content_type='application/octet-stream')
+            status, body = await session.lgn._request('POST', url, data=form)
+            if status == 404:
+                raise Exception(body.decode('utf-8'))
+            elif not status == 200:
+                raise Exception('Problem uploading images')
+
+            viz = cls(session=session, json=json.loads(body.decode('utf-8')), viztype=viztype)
+
+        elif first_image is None:
+            payload = {'data': data, 'type': type, 'options': options}
+            if description:
+                payload['description'] = description
+            headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
+            status, body = await session.lgn._request('POST', url, data=''.join(iter_json(payload)), headers=headers)
+            if status == 404:
+                raise Exception(body.decode('utf-8'))
+            elif not status == 200:
+                raise Exception('Problem uploading data')
+
+            viz = cls(session=session, json=json.loads(body.decode('utf-8')), viztype=viztype)
+
+        else:
+            form = aiohttp.FormData()
+            form.add_field('type', type)
+            form.add_field('options', json.dumps(options))
+            if description:
+                form.add_field('description', description)
+            form.add_field('file', first_image, filename='file', content_type='application/octet-stream')
+            status, body = await session.lgn._request('POST', url, data=form)
+            if status == 404:
+                raise Exception(body.decode('utf-8'))
+            elif not status == 200:
+                raise Exception('Problem uploading images')
+
+            viz = cls(session=session, json=json.loads(body.decode('utf-8')), viztype=viztype)
+            for image in images:
+                await viz._send_image('POST', image)
+
+        return viz
+
+
+def _clean_data(VizType, encoding, args, kwargs):
+    data = VizType._format_data(VizType.clean(*args, **kwargs), encoding=encoding)
+    if 'images' in data:
+        # finish encoding images still being encoded by a generator
+        data['images'] = list(data['images'])
+    return data
+
+
+async def _in_executor(func, *args):
+    """
+    Run func on the default executor, so that cleaning and encoding large
+    data (e.g. PNG encoding or decimation) does not block the event loop.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, partial(func, *args))
+
+
+def _add_plotter(func, VizType):
+
+    signature = inspect.signature(VizType.clean)
+    options = getattr(VizType, '_options', {})
+
+    async def plotter(self, *args, **kwargs):
+
+        opts = dict((key, value.get('default')) for (key, value) in options.items())
+        for key in list(kwargs.keys()):
+            if key in options:
+                opts[key] = kwargs.pop(key)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+
+        if opts.get('height') is None and opts.get('width') is None:
+            if self.size != 'full':
+                opts['width'] = SIZES[self.size]
+
+        type = VizType._name
+        if VizType._name == 'plot':
+            type = opts.pop('type', None)
+            if type is None:
+                raise ValueError("Must specify a type for custom plots")
+
+        return await self._plot(VizType, type, bound.args, opts)
+
+    plotter.__name__ = func
+    plotter.__doc__ = VizType.clean.__doc__
+    setattr(AsyncLightning, func, plotter)
+
+
+_load_types()
+
+for _func, _VizType in list(REGISTRY.items()):
+    _add_plotter(_func, _VizType)
@@ -0,0 +1,83 @@
+import base64
+
+from numpy import ndarray, ascontiguousarray, frombuffer, dtype as np_dtype, \
+    uint8, uint64, zeros, concatenate, arange, flatnonzero, diff, ones
+
+# array kinds that can be shipped as raw buffers: bool, signed, unsigned, float
+BINARY_KINDS = 'biuf'
+
+
+def is_binary_encodable(x):
+    """
+    Whether an array can be shipped as a typed binary buffer.
+    """
+    return isinstance(x, ndarray) and x.dtype.kind in BINARY_KINDS and x.size > 0
+
+
+def encode_array(x):
+    """
+    Encode a numeric array as a typed binary buffer.
+
+    The buffer is little-endian and C-ordered, base64 encoded so that
+    it can ride inside the JSON envelope of a request, with its dtype and
+    shape as headers, e.g. {'__ndarray__': '...', 'dtype': '<f8', 'shape': [n, 2]}
+    """
+    x = ascontiguousarray(x)
+    if x.dtype.byteorder == '>':
+        x = x.astype(x.dtype.newbyteorder('<'))
+    buf = base64.b64encode(x.tobytes()).decode('ascii')
+    return {'__ndarray__': buf, 'dtype': x.dtype.str, 'shape': list(x.shape)}
+
+
+def decode_array(d):
+    """
+    Decode a typed binary buffer produced by encode_array.
+    """
+    buf = base64.b64decode(d['__ndarray__'])
+    return frombuffer(buf, dtype=np_dtype(d['dtype'])).reshape(d['shape'])
+
+
+# array kinds that can be fingerprinted row by row: numeric, and fixed-size strings
+ROW_KINDS = 'biufSU'
+
+
+def row_fingerprints(x):
+    """
+    A 64-bit fingerprint of each row (first axis) of an array.
+
+    Rows are hashed from their raw bytes, so rows with equal fingerprints
+    are almost certainly equal, and rows with different fingerprints differ.
+    """
+    x = ascontiguousarray(x)
+    n = x.shape[0]
+    raw = x.reshape(n, -1).view(uint8).reshape(n, -1)
+    pad = (-raw.shape[1]) % 8
+    if pad:
+        raw = concatenate([raw, zeros((n, pad), dtype=uint8)], axis=1)
+    words = raw.view('<u8')
+
+    # weight each word with a distinct odd constant, then mix the sum
+    weights = (arange(1, words.shape[1] + 1, dtype=uint64) * uint64(0x9E3779B97F4A7C15)) | uint64(1)
+    h = (words * weights).sum(axis=1, dtype=uint64)
+    h ^= h >> uint64(31)
+    h *= uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> uint64(29)
+    return h
+
+
+def changed_ranges(old, new):
+    """
+    Ranges [start, stop) of rows that differ between two sets of row
+    fingerprints, including rows past the end of the old ones.
+    """
+    changed = ones(len(new), dtype=bool)
+    common = min(len(old), len(new))
+    changed[:common] = old[:common] != new[:common]
+
+    rows = flatnonzero(changed)
+    if not len(rows):
+        return []
+    breaks = flatnonzero(diff(rows) != 1)
+    starts = concatenate([[rows[0]], rows[breaks + 1]])
+    stops = concatenate([rows[breaks], [rows[-1]]]) + 1
+    return [[int(a), int(b)] for (a, b) in zip(starts, stops)]
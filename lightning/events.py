@@ -0,0 +1,326 @@
+import json
+import threading
+import time
+from collections import deque
+
+
+class EventListener(object):
+    """
+    Deliver visualization events to handlers outside IPython.
+
+    A listener thread subscribes to the settings endpoint of a visualization,
+    using server-sent events if the server offers them, and otherwise
+    long-polling with conditional requests so that unchanged settings cost
+    a 304 with no body. While settings stay the same, polls back off from
+    interval to max_interval, so a server that answers at once instead of
+    holding the poll is not asked several times a second.
+
+    Every settings field that changes is delivered as an event named after
+    the field (e.g. 'selected' for scatter selections, 'coords' for regions
+    drawn on an image), along with a 'settings' event carrying all settings.
+    Handlers run on a separate dispatch thread, so a slow handler never
+    delays receiving the next event.
+
+    Parameters
+    ----------
+    viz : Visualization
+        Visualization to listen to.
+
+    interval : float, optional, default=0.25
+        Minimum seconds between polls when long-polling.
+
+    max_interval : float, optional, default=5
+        Maximum seconds between polls while settings are unchanged.
+
+    wait : float, optional, default=30
+        Seconds the server may hold a long-poll before answering.
+    """
+
+    def __init__(self, viz, interval=0.25, max_interval=5, wait=30):
+        self.viz = viz
+        self.interval = interval
+        self.max_interval = max_interval
+        self.wait = wait
+        self.handlers = {}
+        self.mode = None
+        self.received = 0
+        self.dispatched = 0
+        self.last_error = None
+
+        self._settings = None
+        self._delay = interval
+        self._response = None
+        self._events = deque()
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._listener = None
+        self._dispatcher = None
+
+    def __repr__(self):
+        s = 'EventListener\n'
+        s += 'mode: %s\n' % self.mode
+        s += 'events: %s\n' % ', '.join(sorted(self.handlers))
+        return s
+
+    def on(self, event_name, handler):
+        """
+        Call handler with the event data whenever event_name occurs,
+        starting to listen on the first call.
+        """
+        self.handlers[event_name] = handler
+        self.start()
+
+    def start(self):
+        if self._listener is not None:
+            return
+        self._stopped.clear()
+        self._listener = threading.Thread(target=self._listen, name='lightning-events-%s' % self.viz.id)
+        self._dispatcher = threading.Thread(target=self._dispatch, name='lightning-handlers-%s' % self.viz.id)
+        for thread in (self._listener, self._dispatcher):
+            thread.daemon = True
+            thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop listening, after handling events already received.
+        """
+        self._stopped.set()
+        response = self._response
+        if response is not None:
+            # unblock a pending read on the event stream where supported
+            shutdown = getattr(response.raw, 'shutdown', None)
+            if shutdown is not None:
+                shutdown()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in (self._listener, self._dispatcher):
+            if thread is not None:
+                thread.join(timeout)
+        self._listener = None
+        self._dispatcher = None
+
+    def _url(self):
+        viz = self.viz
+        return viz.session.host + '/sessions/' + str(viz.session.id) + '/visualizations/' + str(viz.id) + '/settings/'
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            try:
+                if self.mode != 'poll' and self._stream():
+                    continue
+                self.mode = 'poll'
+                self._poll()
+            except Exception as e:
+                if self._stopped.is_set():
+                    return
+                self.last_error = e
+                self._stopped.wait(1)
+
+    def _stream(self):
+        """
+        Read server-sent events until the stream ends. Returns False if the
+        server does not offer an event stream.
+        """
+        headers = {'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'}
+        r = self.viz.session.transport.get(self._url(), headers=headers, auth=self.viz.auth,
+                                           stream=True, timeout=(10, self.wait + 10))
+        if not r.headers.get('Content-Type', '').startswith('text/event-stream'):
+            if r.status_code == 200:
+                self._update(r.json(), r.headers.get('ETag'))
+            r.close()
+            return False
+
+        self.mode = 'stream'
+        self._response = r
+        try:
+            name, data = None, []
+            for line in _lines(r):
+                if self._stopped.is_set():
+                    break
+                if not line:
+                    if data:
+                        self._message(name, '\n'.join(data))
+                    name, data = None, []
+                elif line.startswith('event:'):
+                    name = line[6:].strip()
+                elif line.startswith('data:'):
+                    data.append(line[5:].strip())
+        finally:
+            self._response = None
+            r.close()
+        return True
+
+    def _message(self, name, data):
+        data = json.loads(data)
+        if isinstance(data, dict) and 'settings' in data:
+            self._update(data, None)
+        elif isinstance(data, dict) and name is None and 'type' in data:
+            self._emit(data['type'], data.get('data'))
+        else:
+            self._emit(name or 'message', data)
+
+    def _poll(self):
+        headers = {'Prefer': 'wait=%d' % self.wait}
+        etag = getattr(self.viz, '_user_data_etag', None)
+        if etag:
+            headers['If-None-Match'] = etag
+
+        start = time.time()
+        r = self.viz.session.transport.get(self._url(), headers=headers, auth=self.viz.auth,
+                                           timeout=self.wait + 10)
+        changed = False
+        if r.status_code == 200:
+            changed = self._update(r.json(), r.headers.get('ETag'))
+        elif r.status_code != 304:
+            raise Exception('Error retrieving user data from server')
+
+        if changed:
+            self._delay = self.interval
+        else:
+            self._delay = min(self._delay * 2, self.max_interval)
+        remaining = self._delay - (time.time() - start)
+        if remaining > 0:
+            self._stopped.wait(remaining)
+
+    def _update(self, content, etag):
+        """
+        Emit events for settings fields that changed since the last update,
+        returning whether any did.
+        """
+        viz = self.viz
+        viz._user_data = content
+        viz._user_data_time = time.time()
+        if etag:
+            viz._user_data_etag = etag
+
+        settings = content.get('settings', {})
+        previous = self._settings
+        self._settings = settings
+        if previous is None:
+            # the first response is the starting point, not an event
+            return False
+
+        changed = [key for key in settings if settings[key] != previous.get(key)]
+        for key in changed:
+            value = settings[key]
+            if key == 'selected' and hasattr(viz, '_original_indices'):
+                value = viz._original_indices(value)
+            self._emit(key, value)
+        if changed:
+            self._emit('settings', settings)
+        return bool(changed)
+
+    def _emit(self, name, data):
+        with self._cond:
+            self.received += 1
+            if name in self.handlers:
+                self._events.append((self.handlers[name], data))
+                self._cond.notify_all()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._events and not self._stopped.is_set():
+                    self._cond.wait()
+                if not self._events:
+                    return
+                handler, data = self._events.popleft()
+
+            try:
+                handler(data)
+            except Exception as e:
+                self.last_error = e
+            self.dispatched += 1
+
+
+class RateLimited(object):
+    """
+    Wrap an event handler to limit how often it is called.
+
+    With throttle, the first event is handled immediately and later events
+    at most once per throttle seconds, with the latest data at the end of
+    each interval. With debounce, only the latest data is handled, once
+    events have paused for debounce seconds. Delayed calls run on a timer
+    thread.
+
+    Parameters
+    ----------
+    handler : function
+        Event handler, called with the event data
+
+    throttle : float, optional, default=None
+        Minimum seconds between calls
+
+    debounce : float, optional, default=None
+        Seconds without events before calling, cannot be combined with throttle
+    """
+
+    def __init__(self, handler, throttle=None, debounce=None):
+        if throttle is not None and debounce is not None:
+            raise ValueError("Set either throttle or debounce, not both")
+        self.handler = handler
+        self.throttle = throttle
+        self.debounce = debounce
+
+        self._lock = threading.Lock()
+        self._last = None
+        self._pending = None
+        self._timer = None
+
+    def __call__(self, data):
+        with self._lock:
+            if self.debounce is not None:
+                self._pending = (data,)
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._schedule(self.debounce)
+                return
+
+            now = time.time()
+            if self._timer is not None:
+                # a trailing call is already scheduled, it will take the latest data
+                self._pending = (data,)
+                return
+            if self._last is not None and now - self._last < self.throttle:
+                self._pending = (data,)
+                self._schedule(self.throttle - (now - self._last))
+                return
+            self._last = now
+
+        self.handler(data)
+
+    def _schedule(self, delay):
+        self._timer = threading.Timer(delay, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _fire(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = None
+            self._timer = None
+            self._last = time.time()
+        if pending is not None:
+            self.handler(pending[0])
+
+
+def _lines(response):
+    """
+    Lines of a streamed response as soon as they arrive, without waiting
+    for a full read buffer as iter_lines does.
+    """
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        chunks = response.iter_content(chunk_size=1)
+    else:
+        chunks = iter(lambda: read1(65536), b'')
+
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b'\r').decode('utf-8')
+    if pending:
+        yield pending.decode('utf-8')
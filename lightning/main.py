@@ -1,12 +1,26 @@
-import requests
+import json
+import weakref
+from functools import partial
+
 from .session import Session
 from .visualization import Visualization, VisualizationLocal
+from .transport import Transport
 
 
 class Lightning(object):
 
-    def __init__(self, host="http://localhost:3000", local=False, ipython=False, auth=None, size='medium', quiet=False):
+    def __init__(self, host="http://localhost:3000", local=False, ipython=False, auth=None, size='medium', quiet=False,
+                 transport=None):
         self.quiet = quiet
+        self.encoding = 'json'
+        self.concurrency = None
+        self.delta_enabled = False
+        self._executor = None
+        self._submitted = None
+        self._comm = None
+        self._comm_multiplex = False
+        self._comm_visualizations = weakref.WeakValueDictionary()
+        self.transport = transport if transport is not None else Transport()
 
         if not self.quiet:
             if ipython:
@@ -27,7 +41,10 @@ class Lightning(object):
 
             status = self.check_status()
             if not status:
-                raise ValueError("Could not access server")
+                if not getattr(self.transport, 'spooled', False):
+                    raise ValueError("Could not access server")
+                if not self.quiet:
+                    print("Requests will be sent once the server is reachable")
 
         if ipython:
             self.enable_ipython()
@@ -36,6 +53,14 @@ class Lightning(object):
             self.ipython_enabled = False
             self.set_size('full')
 
+    def __getattr__(self, name):
+        # plotting methods are registered when the plot types are first imported
+        from lightning import _types, _load_types
+        if name.startswith('_') or _types:
+            raise AttributeError("'Lightning' object has no attribute '%s'" % name)
+        _load_types()
+        return getattr(self, name)
+
     def __repr__(self):
         s = 'Lightning\n'
         if hasattr(self, 'host') and self.host is not None and not self.local_enabled:
@@ -49,14 +74,23 @@ class Lightning(object):
     def get_ipython_markup_link(self):
         return '%s/js/ipython-comm.js' % self.host
 
-    def enable_ipython(self, **kwargs):
+    def enable_ipython(self, multiplex=False, **kwargs):
         """
         Enable plotting in the iPython notebook.
 
         Once enabled, all lightning plots will be automatically produced
         within the iPython notebook. They will also be available on
         your lightning server within the current session.
+
+        Parameters
+        ----------
+        multiplex : boolean, optional, default=False
+            Whether to route notebook events for all visualizations over a
+            single comm. Requires a lightning server whose comm script
+            understands multiplexed comms, otherwise each visualization
+            opens its own comm.
         """
+        self._comm_multiplex = multiplex
 
         # inspired by code powering similar functionality in mpld3
         # https://github.com/jakevdp/mpld3/blob/master/mpld3/_display.py#L357
@@ -79,7 +113,7 @@ class Lightning(object):
             formatter.for_type(VisualizationLocal, lambda viz, kwds=kwargs: viz.get_html())
         else:
             formatter.for_type(Visualization, lambda viz, kwds=kwargs: viz.get_html())
-            r = requests.get(self.get_ipython_markup_link(), auth=self.auth)
+            r = self.transport.get(self.get_ipython_markup_link(), auth=self.auth)
             display(Javascript(r.text))
 
     def disable_ipython(self):
@@ -97,6 +131,65 @@ class Lightning(object):
         formatter.type_printers.pop(Visualization, None)
         formatter.type_printers.pop(VisualizationLocal, None)
 
+        if self._comm is not None:
+            self._comm.close()
+            self._comm = None
+        for viz in list(self._comm_visualizations.values()):
+            if viz.comm is not None:
+                viz.comm.close()
+                viz.comm = None
+        self._comm_visualizations = weakref.WeakValueDictionary()
+
+    def _subscribe(self, viz):
+        """
+        Route notebook events for a visualization to it.
+
+        With multiplexing enabled (see enable_ipython), a single comm is
+        opened per Lightning instance, on the first subscription, and
+        messages are routed by visualization id. Otherwise the visualization
+        opens its own comm, as the comm script served by lightning servers
+        expects.
+        """
+        if viz.id in self._comm_visualizations:
+            return
+
+        from ipykernel.comm import Comm
+        self._comm_visualizations[viz.id] = viz
+        if not self._comm_multiplex:
+            viz.comm = Comm('lightning', {'id': viz.id})
+            viz.comm.on_msg(partial(self._handle_comm_message, viz_id=viz.id))
+            return
+
+        if self._comm is None:
+            self._comm = Comm('lightning', {'multiplex': True})
+            self._comm.on_msg(self._handle_comm_message)
+        self._comm.send({'subscribe': viz.id})
+
+    def _unsubscribe(self, viz):
+        """
+        Stop routing notebook events to a visualization, and tell the notebook.
+        """
+        if self._comm_visualizations.pop(viz.id, None) is None:
+            return
+        if viz.comm is not None:
+            viz.comm.close()
+            viz.comm = None
+        elif self._comm is not None:
+            self._comm.send({'unsubscribe': viz.id})
+
+    def _handle_comm_message(self, message, viz_id=None):
+        # Parsing logic taken from similar code in matplotlib
+        message = json.loads(message['content']['data'])
+
+        # messages without an id come from a comm opened for one visualization
+        viz_id = message.get('id', viz_id)
+        if viz_id is None and len(self._comm_visualizations) == 1:
+            viz_id = list(self._comm_visualizations)[0]
+
+        viz = self._comm_visualizations.get(viz_id)
+        if viz is not None:
+            viz._handle_comm_message(message)
+
     def create_session(self, name=None):
         """
         Create a lightning session.
@@ -117,6 +210,95 @@ class Lightning(object):
         self.session = Session(lgn=self, id=session_id)
         return self.session
 
+    def set_concurrency(self, workers=None):
+        """
+        Set the number of plots that submit and map_plots create concurrently.
+
+        Defaults to the per-host connection limit of the transport.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.concurrency = workers
+        return self
+
+    def _get_executor(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            import threading
+            workers = self.concurrency
+            if workers is None:
+                workers = getattr(self.transport, 'pool_maxsize', 4)
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+            self._submitted = 0
+            self._registered = 0
+            self._skipped = set()
+            self._submitted_cond = threading.Condition()
+        return self._executor
+
+    def submit(self, plot_type, *args, **kwargs):
+        """
+        Create a visualization in the background, returning a future.
+
+        Takes a plot type by name (e.g. 'scatter') followed by the same
+        arguments as the corresponding plotting method. Cleaning, formatting,
+        and uploading run on worker threads, so many plots can be in flight
+        at once (see set_concurrency). Completed visualizations are added to
+        the session in the order they were submitted.
+        """
+        from lightning.types.decorators import lookup, bind
+
+        VizType = lookup(plot_type)
+        args, kwargs = bind(VizType, args, kwargs)
+
+        # create the session up front so workers share it
+        if not self.local_enabled and not hasattr(self, 'session'):
+            self.create_session()
+
+        executor = self._get_executor()
+        with self._submitted_cond:
+            ticket = self._submitted
+            self._submitted += 1
+            future = executor.submit(self._plot_submitted, ticket, VizType, args, kwargs)
+        future.add_done_callback(lambda f: f.cancelled() and self._skip_submitted(ticket))
+        return future
+
+    def _plot_submitted(self, ticket, VizType, args, kwargs):
+        # register in submission order, before the future resolves
+        from lightning.types.decorators import plot
+        viz = None
+        try:
+            viz = plot(self, VizType, args, kwargs, False)
+            return viz
+        finally:
+            with self._submitted_cond:
+                while self._registered != ticket:
+                    self._submitted_cond.wait()
+                if viz is not None and not self.local_enabled:
+                    self.session.visualizations.append(viz)
+                self._skip_submitted(ticket)
+
+    def _skip_submitted(self, ticket):
+        with self._submitted_cond:
+            self._skipped.add(ticket)
+            while self._registered in self._skipped:
+                self._skipped.discard(self._registered)
+                self._registered += 1
+            self._submitted_cond.notify_all()
+
+    def map_plots(self, plot_type, *iterables, **kwargs):
+        """
+        Create one visualization per set of arguments, concurrently.
+
+        Like map, takes a plot type followed by one iterable per positional
+        argument, with keyword arguments shared by all plots. Returns the
+        visualizations in order, e.g.
+
+        >>> lgn.map_plots('line', [series1, series2, series3], thickness=2)
+        """
+        futures = [self.submit(plot_type, *args, **kwargs) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
     def enable_local(self):
         """
         Enable a local mode.
@@ -133,6 +315,24 @@ class Lightning(object):
         """
         self.local_enabled = False
 
+    def enable_delta(self):
+        """
+        Enable delta updates for visualizations created from now on.
+
+        The data each visualization is created with is fingerprinted, so
+        that even the first update sends only what changed (see
+        Visualization.enable_delta).
+        """
+        self.delta_enabled = True
+        return self
+
+    def disable_delta(self):
+        """
+        Disable delta updates for visualizations created from now on.
+        """
+        self.delta_enabled = False
+        return self
+
     def set_basic_auth(self, username, password):
         """
         Set authenatication.
@@ -155,6 +355,34 @@ class Lightning(object):
         self.host = host
         return self
 
+    def set_transport(self, transport):
+        """
+        Set the transport used for all requests to the lightning server.
+
+        The transport holds a pool of keep-alive connections shared by
+        sessions and visualizations created from this object.
+        """
+        if self.transport is not None and self.transport is not transport:
+            self.transport.close()
+        self.transport = transport
+        return self
+
+    def set_encoding(self, encoding='json'):
+        """
+        Set the wire format used for numeric array data.
+
+        With 'json' (the default) arrays are sent as nested lists. With 'binary'
+        numeric arrays (e.g. points, series, matrices, links, and per-point
+        properties) are sent as base64 encoded typed buffers with dtype and
+        shape headers inside the JSON payload, which is much smaller and faster
+        to produce for large arrays. Requires a server that supports it.
+        Local mode always uses 'json'.
+        """
+        if encoding not in ['json', 'binary']:
+            raise ValueError("Encoding must be one of 'json', 'binary'")
+        self.encoding = encoding
+        return self
+
     def set_size(self, size='medium'):
         """
         Set a figure size using one of four options.
@@ -170,9 +398,10 @@ class Lightning(object):
         """
         Check the server for status
         """
+        import requests
         try:
-            r = requests.get(self.host + '/status', auth=self.auth,
-                             timeout=(10.0, 10.0))
+            r = self.transport.get(self.host + '/status', auth=self.auth,
+                                   timeout=(10.0, 10.0))
             if not r.status_code == requests.codes.ok:
                 print("Problem connecting to server at %s" % self.host)
                 print("status code: %s" % r.status_code)
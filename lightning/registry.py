@@ -0,0 +1,142 @@
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from functools import partial
+
+
+class VisualizationRegistry(object):
+    """
+    Visualizations created in a session, oldest first.
+
+    Behaves like a list of the visualizations that are still registered,
+    without keeping them alive forever. By default visualizations are held
+    by weak reference, and drop out once nothing else refers to them. With
+    weak=False they are held strongly, so maxsize should be set to bound
+    the registry.
+
+    Parameters
+    ----------
+    maxsize : int, optional, default=None
+        Maximum number of visualizations to keep, dropping the oldest first.
+
+    weak : boolean, optional, default=True
+        Whether to hold visualizations by weak reference.
+    """
+
+    def __init__(self, maxsize=None, weak=True):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("Registry size must be at least 1")
+        self.maxsize = maxsize
+        self.weak = weak
+
+        self.added = 0
+        self.evicted = 0
+        self.collected = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        s = 'VisualizationRegistry\n'
+        for key, value in sorted(self.stats().items()):
+            s += '%s: %s\n' % (key, value)
+        return s
+
+    def _alive(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        if self.weak:
+            entries = [ref() for ref in entries]
+        return [viz for viz in entries if viz is not None]
+
+    def _collect(self, key, ref):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.collected += 1
+
+    def append(self, viz):
+        with self._lock:
+            key = self.added
+            self.added += 1
+            self._entries[key] = weakref.ref(viz, partial(self._collect, key)) if self.weak else viz
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def extend(self, visualizations):
+        for viz in visualizations:
+            self.append(viz)
+
+    def remove(self, viz):
+        with self._lock:
+            for key, value in list(self._entries.items()):
+                if (value() if self.weak else value) is viz:
+                    del self._entries[key]
+                    return
+        raise ValueError("Visualization is not registered")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, id):
+        """
+        Registered visualization with the given id, or None.
+        """
+        for viz in self._alive():
+            if viz.id == id:
+                return viz
+        return None
+
+    def __len__(self):
+        return len(self._alive())
+
+    def __iter__(self):
+        return iter(self._alive())
+
+    def __getitem__(self, index):
+        return self._alive()[index]
+
+    def __contains__(self, viz):
+        return any(v is viz for v in self._alive())
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def stats(self):
+        """
+        Counts of registered visualizations, and an estimate of their memory use.
+
+        Reports the number of visualizations registered, ever added, dropped
+        for exceeding maxsize, and garbage collected, and the approximate
+        bytes held by the registered visualizations' own attributes (e.g.
+        cached user data and delta fingerprints).
+        """
+        alive = self._alive()
+        nbytes = sys.getsizeof(self._entries)
+        for viz in alive:
+            nbytes += sys.getsizeof(viz)
+            for value in vars(viz).values():
+                nbytes += _sizeof(value)
+
+        return {
+            'count': len(alive),
+            'maxsize': self.maxsize,
+            'added': self.added,
+            'evicted': self.evicted,
+            'collected': self.collected,
+            'bytes': nbytes
+        }
+
+
+def _sizeof(value):
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(getattr(v, 'nbytes', 0) for v in value.values())
+    return sys.getsizeof(value)
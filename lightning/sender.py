@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import deque
+
+
+class BackgroundSender(object):
+    """
+    Send appends to a visualization from a background thread.
+
+    Appends are placed on a bounded queue and drained by a single sender
+    thread, in order, so that the caller never waits on the network
+    unless the queue is full and the overflow policy is 'block'.
+
+    Parameters
+    ----------
+    viz : Visualization
+        Visualization to append to.
+
+    maxsize : int, optional, default=100
+        Maximum number of appends waiting to be sent.
+
+    overflow : str, optional, default='block'
+        What to do when the queue is full. 'block' waits for space,
+        'drop-oldest' discards the oldest waiting append, and 'coalesce'
+        merges the new append into the newest waiting one (falling back
+        to 'block' when the two cannot be merged).
+    """
+
+    policies = ['block', 'drop-oldest', 'coalesce']
+
+    def __init__(self, viz, maxsize=100, overflow='block'):
+        if overflow not in self.policies:
+            raise ValueError("Overflow must be one of %s" % ', '.join("'%s'" % p for p in self.policies))
+        if maxsize < 1:
+            raise ValueError("Queue size must be at least 1")
+
+        self.viz = viz
+        self.maxsize = maxsize
+        self.overflow = overflow
+
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.last_error = None
+
+        self._pending = deque()
+        self._inflight = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='lightning-sender-%s' % viz.id)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __repr__(self):
+        s = 'BackgroundSender\n'
+        s += 'overflow: %s\n' % self.overflow
+        for key, value in sorted(self.stats().items()):
+            s += '%s: %s\n' % (key, value)
+        return s
+
+    def put(self, datadict):
+        """
+        Queue cleaned data to be appended.
+        """
+        with self._cond:
+            if self._closed:
+                raise ValueError("Sender is closed")
+
+            if len(self._pending) >= self.maxsize:
+                if self.overflow == 'drop-oldest':
+                    self._pending.popleft()
+                    self.dropped += 1
+
+                elif self.overflow == 'coalesce':
+                    merged = self.viz._coalesce(self._pending[-1], datadict)
+                    if merged is not None:
+                        self._pending[-1] = merged
+                        self.coalesced += 1
+                        self.queued += 1
+                        return
+
+            while len(self._pending) >= self.maxsize and not self._closed:
+                self._cond.wait()
+
+            self._pending.append(datadict)
+            self.queued += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued appends have been sent.
+
+        Returns True if the queue was drained, or False on timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._pending or self._inflight:
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Send remaining appends and stop the sender thread.
+        """
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return drained
+
+    def stats(self):
+        """
+        Counters for queued, sent, dropped, coalesced, and failed appends.
+        """
+        with self._cond:
+            return {
+                'queued': self.queued,
+                'sent': self.sent,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'failed': self.failed,
+                'pending': len(self._pending) + self._inflight
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                datadict = self._pending.popleft()
+                self._inflight += 1
+                self._cond.notify_all()
+
+            try:
+                r = self.viz._send_append(datadict)
+                if r is not None and not 200 <= r.status_code < 300:
+                    raise Exception('Append failed with status %s' % r.status_code)
+                failed = False
+            except Exception as e:
+                self.last_error = e
+                failed = True
+
+            with self._cond:
+                self._inflight -= 1
+                if failed:
+                    self.failed += 1
+                else:
+                    self.sent += 1
+                self._cond.notify_all()
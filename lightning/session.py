@@ -1,22 +1,27 @@
-import requests
 import json
-import webbrowser
+
+from .registry import VisualizationRegistry
 
 
 class Session(object):
     name = None
-    visualizations = []
 
     def __init__(self, lgn=None, id=None, json=None):
         self.lgn = lgn
         self.host = lgn.host
         self.auth = lgn.auth
         self.id = id
+        self.visualizations = VisualizationRegistry()
 
         if json:
             self.id = json.get('id')
             self.name = json.get('name')
 
+    @property
+    def transport(self):
+        # read through, so set_transport also applies to existing sessions
+        return self.lgn.transport
+
     def __str__(self):
         if self.name:
             return self.name
@@ -29,7 +34,68 @@ class Session(object):
             s += "name: " + str(self.name)
         return s
 
+    def set_registry(self, maxsize=None, weak=True):
+        """
+        Set how visualizations created in this session are kept.
+
+        By default they are held by weak reference and drop out of
+        session.visualizations once nothing else refers to them.
+
+        Parameters
+        ----------
+        maxsize : int, optional, default=None
+            Maximum number of visualizations to keep, dropping the oldest first.
+
+        weak : boolean, optional, default=True
+            Whether to hold visualizations by weak reference.
+        """
+        registry = VisualizationRegistry(maxsize=maxsize, weak=weak)
+        registry.extend(self.visualizations)
+        self.visualizations = registry
+        return self
+
+    def delete_visualizations(self, visualizations=None):
+        """
+        Delete visualizations from the server, by default all registered ones.
+
+        Returns the number of visualizations deleted.
+        """
+        if visualizations is None:
+            visualizations = list(self.visualizations)
+
+        deleted = 0
+        for viz in visualizations:
+            r = viz.delete()
+            if r is not None and r.status_code == 200:
+                deleted += 1
+            if viz in self.visualizations:
+                self.visualizations.remove(viz)
+
+        return deleted
+
+    def close(self, delete=False):
+        """
+        Release the visualizations registered in this session.
+
+        Stops their event listeners and notebook event routing, and
+        empties the registry. With delete=True, they are also deleted
+        from the server.
+        """
+        visualizations = list(self.visualizations)
+        if delete:
+            self.delete_visualizations(visualizations)
+
+        unsubscribe = getattr(self.lgn, '_unsubscribe', None)
+        for viz in visualizations:
+            if hasattr(viz, 'stop_events'):
+                viz.stop_events()
+            if unsubscribe is not None:
+                unsubscribe(viz)
+
+        self.visualizations.clear()
+
     def open(self):
+        import webbrowser
         webbrowser.open(self.host + '/sessions/' + str(self.id) + '/feed/')
 
     @classmethod
@@ -41,5 +107,5 @@ class Session(object):
             payload = {'name': name}
 
         headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-        r = requests.post(url, data=json.dumps(payload), headers=headers, auth=lgn.auth)
+        r = lgn.transport.post(url, data=json.dumps(payload), headers=headers, auth=lgn.auth)
         return cls(lgn=lgn, json=r.json())
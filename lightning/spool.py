@@ -0,0 +1,445 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from .transport import Transport
+
+_PLACEHOLDER = re.compile(r'spool-[0-9a-f]{32}')
+
+
+class SpoolTransport(Transport):
+    """
+    Transport that writes requests to a disk log and replays them in the background.
+
+    Requests that change the server (creating sessions and visualizations,
+    updates, appends and deletes) are appended to an append-only log at
+    path and answered immediately, so plotting runs at local disk speed
+    even when the server is slow or unreachable. A replayer thread sends
+    logged requests to the server strictly in the order they were made,
+    retrying with backoff while the server cannot be reached.
+
+    Sessions and visualizations created through the spool are given
+    placeholder ids, which the replayer swaps for the ids returned by the
+    server in every later request. Read requests (e.g. user data) go to
+    the server directly, once the visualization they refer to exists.
+
+    A request the server answers with an error status is retried up to
+    max_attempts times for a 5xx status and not at all for a 4xx status,
+    then counted as failed and skipped, so one request the server cannot
+    handle does not hold up every later one.
+
+    The replay position and the ids received are kept next to the log, so
+    requests still in the log when a process exits are sent by the next
+    SpoolTransport opened on the same path. Note that the log holds the
+    request headers, including credentials when auth is used.
+
+    Parameters
+    ----------
+    path : str
+        Path of the log file, created if it does not exist.
+
+    transport : Transport, optional, default=None
+        Transport used to reach the server, by default a new Transport.
+
+    retry : float, optional, default=0.5
+        Seconds to wait before the first retry while the server is
+        unreachable, doubling on every failure up to max_retry.
+
+    max_retry : float, optional, default=30
+        Maximum seconds between retries.
+
+    timeout : float, optional, default=60
+        Timeout in seconds for each replayed request.
+
+    max_attempts : int, optional, default=5
+        Times to send a request the server answers with a 5xx status
+        before skipping it.
+
+    sync : boolean, optional, default=False
+        Whether to fsync the log after every request, so spooled requests
+        also survive a crash of the machine, not just of the process.
+    """
+
+    spooled = True
+
+    def __init__(self, path, transport=None, retry=0.5, max_retry=30, timeout=60, max_attempts=5,
+                 sync=False):
+        self.path = path
+        self.transport = transport if transport is not None else Transport()
+        self.retry = retry
+        self.max_retry = max_retry
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.sync = sync
+
+        self.spooled_requests = 0
+        self.replayed = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_error = None
+
+        self._ids = {}
+        self._offset = 0
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._replayer = None
+
+        self._load()
+        self._log = open(self.path, 'ab')
+        self._ids_log = open(self._ids_path(), 'a')
+        self._start()
+
+    def __repr__(self):
+        s = 'SpoolTransport\n'
+        s += 'path: %s\n' % self.path
+        s += 'pending: %s\n' % self.pending()
+        return s
+
+    @property
+    def pool_maxsize(self):
+        return self.transport.pool_maxsize
+
+    def _state_path(self):
+        return self.path + '.state'
+
+    def _ids_path(self):
+        return self.path + '.ids'
+
+    def _load(self):
+        """
+        Restore the replay position and the ids still needed by spooled
+        requests, and drop a record left half written by a process that
+        stopped while spooling it.
+        """
+        state_path = self._state_path()
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                self._offset = json.load(f)['offset']
+
+        ids = {}
+        if os.path.exists(self._ids_path()):
+            with open(self._ids_path()) as f:
+                for line in f:
+                    if line.endswith('\n'):
+                        ids.update(json.loads(line))
+
+        if not os.path.exists(self.path):
+            open(self.path, 'wb').close()
+        if self._offset > os.path.getsize(self.path):
+            self._offset = 0
+
+        referenced = set()
+        with open(self.path, 'rb+') as f:
+            end = self._offset
+            f.seek(end)
+            while True:
+                record = _read_record(f)
+                if record is None:
+                    break
+                referenced.update(_PLACEHOLDER.findall(record[0]['url']))
+                end = f.tell()
+            f.truncate(end)
+        self._size = end
+
+        # ids are appended as they arrive, keep only those still referenced
+        self._ids = dict((key, value) for (key, value) in ids.items() if key in referenced)
+        with open(self._ids_path() + '.tmp', 'w') as f:
+            for key, value in self._ids.items():
+                f.write(json.dumps({key: value}) + '\n')
+        _replace(self._ids_path() + '.tmp', self._ids_path())
+
+    def _save(self):
+        state_path = self._state_path()
+        with open(state_path + '.tmp', 'w') as f:
+            json.dump({'offset': self._offset}, f)
+        _replace(state_path + '.tmp', state_path)
+
+    def _start(self):
+        self._stopped.clear()
+        self._replayer = threading.Thread(target=self._replay, name='lightning-spool')
+        self._replayer.daemon = True
+        self._replayer.start()
+
+    def request(self, method, url, **kwargs):
+        if method.upper() in ('GET', 'HEAD', 'OPTIONS'):
+            return self._forward(method, url, **kwargs)
+        return self._spool(method, url, **kwargs)
+
+    def _forward(self, method, url, **kwargs):
+        """
+        Send a read request directly, once the placeholders in its url are known.
+        """
+        if _PLACEHOLDER.search(url) and not self._resolved(url):
+            self.flush(self.timeout)
+        return self.transport.request(method, self._substitute(url), **kwargs)
+
+    def _spool(self, method, url, data=None, files=None, headers=None, auth=None, **kwargs):
+        import requests
+
+        prepared = requests.Request(method.upper(), url, data=data, files=files,
+                                    headers=headers, auth=auth).prepare()
+        body = prepared.body
+        if body is None:
+            body = b''
+        elif not isinstance(body, (bytes, str)):
+            # streamed bodies, e.g. edge lists, are written out in full
+            body = b''.join(chunk.encode('utf-8') if not isinstance(chunk, bytes) else chunk
+                            for chunk in body)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        headers = dict((key, value) for (key, value) in prepared.headers.items()
+                       if key.lower() not in ('content-length', 'transfer-encoding'))
+
+        content = {}
+        placeholder = None
+        if prepared.method == 'POST' and _creates(prepared.url):
+            placeholder = 'spool-' + uuid.uuid4().hex
+            content['id'] = placeholder
+            if data is not None and 'json' in headers.get('Content-Type', ''):
+                try:
+                    name = json.loads(body.decode('utf-8')).get('name')
+                except (ValueError, AttributeError):
+                    name = None
+                if name:
+                    content['name'] = name
+
+        header = {'method': prepared.method, 'url': prepared.url, 'headers': headers,
+                  'placeholder': placeholder, 'size': len(body)}
+        record = json.dumps(header).encode('utf-8') + b'\n' + body
+
+        with self._cond:
+            self._log.write(record)
+            self._log.flush()
+            if self.sync:
+                os.fsync(self._log.fileno())
+            self._size += len(record)
+            self.spooled_requests += 1
+            self._cond.notify_all()
+
+        return SpooledResponse(content)
+
+    def _substitute(self, url):
+        return _PLACEHOLDER.sub(lambda m: str(self._ids.get(m.group(0), m.group(0))), url)
+
+    def _resolved(self, url):
+        return all(p in self._ids for p in _PLACEHOLDER.findall(url))
+
+    def resolve(self, id):
+        """
+        Server id for a placeholder id, or None if not yet created.
+        Ids that are not placeholders are returned unchanged.
+        """
+        if not _PLACEHOLDER.match(str(id)):
+            return id
+        return self._ids.get(id)
+
+    def _replay(self):
+        import requests
+
+        delay = self.retry
+        attempts = 0
+        reader = open(self.path, 'rb')
+        try:
+            while True:
+                with self._cond:
+                    while self._offset >= self._size and not self._stopped.is_set():
+                        self._compact()
+                        self._cond.wait()
+                    if self._stopped.is_set():
+                        return
+                    offset = self._offset
+
+                reader.seek(offset)
+                header, body = _read_record(reader)
+                end = reader.tell()
+
+                try:
+                    delivered = self._send(header, body)
+                    if delivered is None:
+                        # the server answered with an error, give up after max_attempts
+                        attempts += 1
+                        if attempts >= self.max_attempts:
+                            delivered = False
+                except requests.exceptions.RequestException as e:
+                    # the server could not be reached, retry for as long as it takes
+                    self.last_error = e
+                    delivered = None
+                except Exception as e:
+                    self.last_error = e
+                    delivered = False
+
+                if delivered is None:
+                    self.retries += 1
+                    if self._stopped.wait(delay):
+                        return
+                    delay = min(delay * 2, self.max_retry)
+                    continue
+                delay = self.retry
+                attempts = 0
+
+                with self._cond:
+                    self._offset = end
+                    if delivered:
+                        self.replayed += 1
+                    else:
+                        self.failed += 1
+                    self._save()
+                    self._cond.notify_all()
+        finally:
+            reader.close()
+
+    def _send(self, header, body):
+        """
+        Send one logged request. Returns True once delivered, False if the
+        server refused it, and None if it should be retried.
+        """
+        url = header['url']
+        if not self._resolved(url):
+            # the visualization it refers to was never created
+            self.last_error = Exception('Unresolved placeholder in %s' % url)
+            return False
+
+        r = self.transport.request(header['method'], self._substitute(url), data=body,
+                                   headers=header['headers'], timeout=self.timeout)
+        if r.status_code >= 500:
+            self.last_error = Exception('Server error %s for %s' % (r.status_code, url))
+            return None
+        if r.status_code >= 400:
+            self.last_error = Exception('Request refused with status %s for %s' % (r.status_code, url))
+            return False
+
+        placeholder = header.get('placeholder')
+        if placeholder is not None:
+            self._ids[placeholder] = r.json().get('id')
+            self._ids_log.write(json.dumps({placeholder: self._ids[placeholder]}) + '\n')
+            self._ids_log.flush()
+        return True
+
+    def _compact(self):
+        """
+        Empty the log once every request in it has been replayed.
+        """
+        if self._offset and self._offset == self._size:
+            self._log.seek(0)
+            self._log.truncate()
+            self._offset = 0
+            self._size = 0
+            self._save()
+
+    def pending(self):
+        """
+        Bytes of spooled requests not yet sent to the server.
+        """
+        return self._size - self._offset
+
+    def flush(self, timeout=None):
+        """
+        Wait until every spooled request has been sent to the server.
+
+        Returns True if the spool emptied within timeout seconds.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._offset < self._size:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self):
+        """
+        Spooling statistics, along with those of the underlying transport.
+
+        Adds the number of requests spooled, replayed, refused by the server
+        and retried, and the bytes still waiting to be sent.
+        """
+        stats = self.transport.stats()
+        stats.update({
+            'spooled': self.spooled_requests,
+            'replayed': self.replayed,
+            'failed': self.failed,
+            'retries': self.retries,
+            'pending': self.pending()
+        })
+        return stats
+
+    def close(self, timeout=0):
+        """
+        Stop replaying and close all connections, after waiting up to
+        timeout seconds for the spool to empty. Requests still spooled
+        are sent by the next SpoolTransport opened on the same path.
+        """
+        if timeout:
+            self.flush(timeout)
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._replayer is not None:
+            self._replayer.join()
+            self._replayer = None
+        self._log.close()
+        self._ids_log.close()
+        self.transport.close()
+
+
+class SpooledResponse(object):
+    """
+    Immediate response to a spooled request.
+    """
+
+    status_code = 200
+    ok = True
+
+    def __init__(self, content):
+        self._content = content
+        self.headers = {'Content-Type': 'application/json'}
+
+    @property
+    def text(self):
+        return json.dumps(self._content)
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+    def json(self):
+        return self._content
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _replace(source, destination):
+    # os.rename fails on Windows when the destination exists
+    getattr(os, 'replace', os.rename)(source, destination)
+
+
+def _creates(url):
+    """
+    Whether a POST to url creates a session or visualization with a new id.
+    """
+    path = url.split('?')[0].rstrip('/')
+    return path.endswith('/sessions') or path.endswith('/visualizations')
+
+
+def _read_record(f):
+    """
+    Next complete record in the log as (header, body), or None at the end.
+    """
+    line = f.readline()
+    if not line.endswith(b'\n'):
+        return None
+    header = json.loads(line.decode('utf-8'))
+    body = f.read(header['size'])
+    if len(body) < header['size']:
+        return None
+    return header, body
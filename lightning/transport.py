@@ -0,0 +1,109 @@
+class Transport(object):
+    """
+    Pooled keep-alive HTTP transport used for all requests to a lightning server.
+
+    Wraps a single requests session so that connections are reused across
+    calls instead of opening a new TCP (and TLS) connection per request.
+
+    Parameters
+    ----------
+    pool_connections : int, optional, default=10
+        Number of per-host connection pools to cache.
+
+    pool_maxsize : int, optional, default=10
+        Maximum number of connections kept alive per host.
+
+    pool_block : boolean, optional, default=False
+        Whether to block when all connections to a host are in use,
+        making pool_maxsize a hard per-host limit.
+
+    max_retries : int, optional, default=0
+        Number of retries for failed connection attempts.
+    """
+
+    # whether requests may reach the server after they return, see SpoolTransport
+    spooled = False
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, max_retries=0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.max_retries = max_retries
+        self._session = None
+        self._adapter = None
+
+    def __repr__(self):
+        s = 'Transport\n'
+        s += 'pool_connections: %s\n' % self.pool_connections
+        s += 'pool_maxsize: %s\n' % self.pool_maxsize
+        return s
+
+    def _get_session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                  pool_maxsize=self.pool_maxsize,
+                                  pool_block=self.pool_block,
+                                  max_retries=self.max_retries)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+            self._adapter = adapter
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        return self._get_session().request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def stats(self):
+        """
+        Connection reuse statistics, summed over all host pools.
+
+        Returns a dictionary with the number of requests made, the number
+        of connections opened, and the number of requests that reused an
+        already open connection.
+        """
+        requests_made = 0
+        connections = 0
+        pools = 0
+        if self._adapter is not None:
+            manager = self._adapter.poolmanager
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                pools += 1
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+
+        return {
+            'pools': pools,
+            'requests': requests_made,
+            'connections': connections,
+            'reused': max(requests_made - connections, 0)
+        }
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        if self._session is not None:
+            self._session.close()
+        self._session = None
+        self._adapter = None
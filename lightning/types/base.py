@@ -1,6 +1,9 @@
+import json
+import time
+
 from lightning import Visualization, VisualizationLocal
-import requests
-import six
+from lightning.encoding import encode_array, is_binary_encodable, row_fingerprints, changed_ranges, ROW_KINDS
+from numpy import asarray, concatenate, ndarray, size
 
 
 class Base(Visualization, VisualizationLocal):
@@ -27,12 +30,33 @@ class Base(Visualization, VisualizationLocal):
 
     _data_dict_inputs = {}
 
+    # fields concatenated when coalescing queued appends, with their axis
+    _stream_fields = {}
+
+    _sender = None
+
+    # indices into the original data of the points that were sent, if decimated
+    _indices = None
+
+    # fingerprints of the last sent data, see enable_delta
+    _delta = None
+
+    # cached user data, see set_user_data_cache
+    _user_data = None
+    _user_data_etag = None
+    _user_data_time = None
+    _user_data_max_age = 0
+    _user_data_timeout = 10
+
     @classmethod
     def _check_unkeyed_arrays(cls, key, val):
 
         if key not in cls._data_dict_inputs:
             return val
 
+        if isinstance(val, dict) and '__ndarray__' in val:
+            return val
+
         if not isinstance(val, list):
             raise Exception("Must provide a list")
 
@@ -52,7 +76,7 @@ class Base(Visualization, VisualizationLocal):
             return out
 
     @staticmethod
-    def _ensure_dict_or_list(x):
+    def _ensure_dict_or_list(x, encoding='json'):
 
         if isinstance(x, dict):
             return x
@@ -66,6 +90,14 @@ class Base(Visualization, VisualizationLocal):
         if isinstance(x, (int, float, complex)):
             return x
 
+        if hasattr(x, 'iterjson'):
+            # serialized in pieces when sent (e.g. EdgeList)
+            return x
+
+        if encoding == 'binary' and is_binary_encodable(x):
+            # ship numeric arrays as typed binary buffers
+            return encode_array(x)
+
         try:
             # convert numpy arrays to lists
             return x.tolist()
@@ -91,16 +123,32 @@ class Base(Visualization, VisualizationLocal):
 
         datadict = cls.clean(*args, **kwargs)
 
+        return cls._format_data(datadict)
+
+    @classmethod
+    def _format_data(cls, datadict, encoding='json'):
+        """
+        Format a cleaned data dictionary for sending.
+
+        With the 'json' encoding, arrays are converted to nested lists.
+        With the 'binary' encoding, numeric arrays are instead shipped as
+        typed binary buffers with dtype and shape headers (see encode_array),
+        and everything else is formatted as with 'json'.
+        """
+
         if 'data' in datadict:
             data = datadict['data']
-            data = cls._ensure_dict_or_list(data)
+            data = cls._ensure_dict_or_list(data, encoding)
         else:
             data = {}
             for key in datadict:
-                if key == 'images':
+                if key.startswith('_'):
+                    # private fields (e.g. '_indices') stay client side
+                    continue
+                if key in ('images', 'packed'):
                     data[key] = datadict[key]
                 else:
-                    d = cls._ensure_dict_or_list(datadict[key])
+                    d = cls._ensure_dict_or_list(datadict[key], encoding)
                     data[key] = cls._check_unkeyed_arrays(key, d)
 
         return data
@@ -111,7 +159,7 @@ class Base(Visualization, VisualizationLocal):
         options = {}
         description = None
         if hasattr(cls, '_options'):
-            for key, value in six.iteritems(kwargs):
+            for key, value in kwargs.items():
                 if key in cls._options:
                     lgn_option = cls._options[key].get('name', key)
                     options[lgn_option] = value
@@ -128,8 +176,14 @@ class Base(Visualization, VisualizationLocal):
 
         payload = {'type': type, 'options': options}
 
+        if 'packed' in data:
+            raise ValueError("Packed uploads are not supported in local mode")
+
         if 'images' in data:
-            payload['images'] = data['images']
+            payload['images'] = data.pop('images')
+            if data:
+                # other fields (e.g. labels) ride alongside the images
+                payload['data'] = data
         else:
             payload['data'] = data
 
@@ -158,15 +212,17 @@ class Base(Visualization, VisualizationLocal):
             raise Exception("Must provide a plot type")
 
         options, description = cls._clean_options(**kwargs)
-        data = cls._clean_data(*args)
+        datadict = cls.clean(*args)
+        data = cls._format_data(datadict, encoding=session.lgn.encoding)
+
+        if 'packed' in data:
+            viz = cls._create(session, packed=data['packed'], type=type, options=options, description=description)
 
-        if 'images' in data and len(data) > 1:
+        elif 'images' in data and len(data) > 1:
             images = data['images']
             del data['images']
             viz = cls._create(session, data=data, type=type, options=options, description=description)
-            first_image, remaining_images = images[0], images[1:]
-            viz._append_image(first_image)
-            for image in remaining_images:
+            for image in images:
                 viz._append_image(image)
 
         elif 'images' in data:
@@ -176,6 +232,11 @@ class Base(Visualization, VisualizationLocal):
         else:
             viz = cls._create(session, data=data, type=type, options=options, description=description)
 
+        viz._indices = datadict.get('_indices')
+        if getattr(session.lgn, 'delta_enabled', False):
+            # the created data is the baseline for the first update
+            viz._delta = cls._fingerprints(datadict) or {}
+
         return viz
 
     def update(self, *args, **kwargs):
@@ -186,42 +247,306 @@ class Base(Visualization, VisualizationLocal):
         updates the data in the visualization.
         """
 
-        data = self._clean_data(*args, **kwargs)
-        if 'images' in data:
-            images = data['images']
+        datadict = self.clean(*args, **kwargs)
+        self._indices = datadict.get('_indices')
+
+        # a spooled patch is answered before the server sees it, so a refused
+        # patch could not fall back to a full update; spooled updates are full
+        if getattr(self.session.transport, 'spooled', False):
+            self._delta = None
+
+        fingerprints = None
+        if self._delta is not None:
+            fingerprints = self._fingerprints(datadict)
+            if fingerprints is not None and self._update_delta(datadict, fingerprints):
+                return
+
+        r = None
+        data = self._format_data(datadict, encoding=self.session.lgn.encoding)
+        if 'packed' in data:
+            r = self._send_packed(data['packed'], method='PUT')
+        elif 'images' in data:
+            images = data.pop('images')
+            if data:
+                # metadata sent alongside the images at creation, e.g. shape and labels
+                self._update_data(data=data)
             for img in images:
-                self._update_image(img)
+                r = self._update_image(img)
         else:
-            self._update_data(data=data)
+            r = self._update_data(data=data)
+
+        if self._delta is not None and r is not None:
+            # only data the server accepted is a baseline for the next patch
+            self._delta = (fingerprints or {}) if r.status_code == 200 else {}
+
+    def enable_delta(self):
+        """
+        Send only what changed in subsequent updates.
+
+        The visualization keeps a fingerprint of each row of the data it last
+        sent. On update, changed row ranges, rows appended at the end, and
+        changed properties are sent as a patch, and nothing is sent if nothing
+        changed. A full update is sent instead when the patch would not be
+        smaller, or the server does not accept it. If the server has no
+        route for patches, delta updates are turned off for the visualization.
+
+        The first update after enable_delta is a full update, unless delta
+        updates were enabled on the Lightning instance when the visualization
+        was created (see Lightning.enable_delta). Delta updates are turned off
+        when requests go through a SpoolTransport.
+        """
+        if self._delta is None:
+            self._delta = {}
+        return self
+
+    def disable_delta(self):
+        """
+        Send the full data on every update.
+        """
+        self._delta = None
+        return self
+
+    @staticmethod
+    def _fingerprint(value):
+        if isinstance(value, ndarray) and value.ndim > 0 and len(value) and value.dtype.kind in ROW_KINDS:
+            return row_fingerprints(value)
+        return hash(json.dumps(Base._ensure_dict_or_list(value), sort_keys=True, default=str))
+
+    @classmethod
+    def _fingerprints(cls, datadict):
+        """
+        Fingerprints of every field, or None if the data cannot be patched.
+        """
+        if 'data' in datadict or 'images' in datadict or 'packed' in datadict:
+            return None
+        return dict((key, cls._fingerprint(value)) for (key, value) in datadict.items()
+                    if not key.startswith('_'))
+
+    def _update_delta(self, datadict, fingerprints):
+        """
+        Send an update as a patch against the last sent data, returning
+        False if a full update should be sent instead.
+        """
+        previous = self._delta
+        if not previous:
+            return False
+
+        fields = list(fingerprints)
+
+        patch = {}
+        patch_cells = 0
+        full_cells = 0
+        for key in fields:
+            value = datadict[key]
+            new = fingerprints[key]
+            old = previous.get(key)
+            full_cells += size(value)
+
+            if isinstance(new, ndarray) and isinstance(old, ndarray):
+                ranges = changed_ranges(old, new)
+                if not ranges and len(old) == len(new):
+                    continue
+                rows = [value[a:b] for (a, b) in ranges]
+                rows = concatenate(rows) if rows else value[:0]
+                patch[key] = {'length': len(value), 'ranges': ranges, 'rows': rows}
+                patch_cells += size(rows) + 2 * len(ranges)
+
+            elif isinstance(new, ndarray) or isinstance(old, ndarray) or new != old:
+                patch[key] = {'value': value}
+                patch_cells += size(value)
+
+        for key in previous:
+            if key not in fingerprints:
+                patch[key] = None
+
+        if not patch:
+            return True
+        if patch_cells >= full_cells:
+            return False
+
+        # rows and values are formatted as in the full data, e.g. keyed points
+        encoding = self.session.lgn.encoding
+        for key, entry in patch.items():
+            if entry is not None:
+                for name in ('rows', 'value'):
+                    if name in entry:
+                        value = self._ensure_dict_or_list(entry[name], encoding)
+                        entry[name] = self._check_unkeyed_arrays(key, value)
+
+        r = self._patch_data(data={'patch': patch})
+        if r.status_code in (404, 405, 501):
+            # the server has no route for patches, stop trying
+            self._delta = None
+            return False
+        if r.status_code != 200:
+            return False
+        self._delta = fingerprints
+        return True
 
     def append(self, *args, **kwargs):
         """
         Base method for appending data.
 
         Applies a plot-type specific cleaning operation, then
-        appends data to the visualization.
+        appends data to the visualization. If background appends are
+        enabled (see enable_background), the data is queued and sent
+        from a background thread instead.
         """
 
-        data = self._clean_data(*args, **kwargs)
-        if 'images' in data:
-            images = data['images']
-            for img in images:
-                self._append_image(img)
+        datadict = self.clean(*args, **kwargs)
+        if self._sender is not None:
+            self._sender.put(datadict)
         else:
-            self._append_data(data=data)
+            self._send_append(datadict)
+
+    def _send_append(self, datadict):
+        """
+        Send cleaned data to append, returning the server response
+        (for images, the first failed response or else the last).
+        """
+        if self._delta:
+            # appended rows are not in the baseline, so the next update is full
+            self._delta = {}
+
+        data = self._format_data(datadict, encoding=self.session.lgn.encoding)
+        if 'packed' in data:
+            return self._send_packed(data['packed'])
+        elif 'images' in data:
+            r = None
+            for img in data['images']:
+                r = self._append_image(img)
+                if r.status_code != 200:
+                    return r
+            return r
+        else:
+            return self._append_data(data=data)
+
+    def enable_background(self, maxsize=100, overflow='block'):
+        """
+        Enable non-blocking appends.
+
+        Once enabled, append returns immediately and data is sent
+        from a background thread. Returns the sender, whose stats
+        method reports queued, sent, and dropped appends.
+
+        Parameters
+        ----------
+        maxsize : int, optional, default=100
+            Maximum number of appends waiting to be sent.
+
+        overflow : str, optional, default='block'
+            Policy when the queue is full, one of 'block' (wait for space),
+            'drop-oldest' (discard the oldest waiting append), or 'coalesce'
+            (merge into the newest waiting append).
+        """
+        from lightning.sender import BackgroundSender
+
+        self.disable_background()
+        self._sender = BackgroundSender(self, maxsize=maxsize, overflow=overflow)
+        return self._sender
+
+    def disable_background(self, timeout=None):
+        """
+        Disable non-blocking appends, sending any that are still queued.
+        """
+        if self._sender is not None:
+            self._sender.close(timeout)
+            self._sender = None
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued background appends have been sent.
+        """
+        if self._sender is not None:
+            return self._sender.flush(timeout)
+        return True
+
+    @classmethod
+    def _coalesce(cls, first, second):
+        """
+        Merge two cleaned appends into one, or return None if they cannot be merged.
+
+        Fields listed in _stream_fields are concatenated along their axis,
+        and must all have the same length within each append. Other fields
+        take their most recent value.
+        """
+
+        if not cls._stream_fields or set(first.keys()) != set(second.keys()):
+            return None
+
+        def lengths(d):
+            out = set()
+            for key, axis in cls._stream_fields.items():
+                if key in d:
+                    out.add(asarray(d[key]).shape[axis])
+            return out
+
+        merged = {}
+        try:
+            if len(lengths(first)) > 1 or len(lengths(second)) > 1:
+                return None
+            for key in second:
+                if key in cls._stream_fields:
+                    axis = cls._stream_fields[key]
+                    merged[key] = concatenate([asarray(first[key]), asarray(second[key])], axis=axis)
+                else:
+                    merged[key] = second[key]
+        except (ValueError, IndexError):
+            return None
+
+        return merged
+
+    def _original_indices(self, indices):
+        """
+        Map indices of points that were sent to indices into the original data.
+        """
+        if self._indices is None:
+            return indices
+        return [int(self._indices[i]) for i in indices]
+
+    def set_user_data_cache(self, max_age=0):
+        """
+        Set how long user data (e.g. selections) is reused without asking the server.
+
+        Within max_age seconds of the last fetch, methods such as selected,
+        points, polygons, and masks are all served from one cached copy.
+        After that the copy is revalidated with a conditional request,
+        which only transfers the data again if it has changed.
+
+        Parameters
+        ----------
+        max_age : float, optional, default=0
+            Seconds to reuse user data before revalidating it
+        """
+        self._user_data_max_age = max_age
+        return self
 
     def _get_user_data(self):
         """
         Base method for retrieving user data from a viz.
         """
 
+        now = time.time()
+        if self._user_data is not None and now - self._user_data_time < self._user_data_max_age:
+            return self._user_data
+
         url = self.session.host + '/sessions/' + str(self.session.id) + '/visualizations/' + str(self.id) + '/settings/'
-        r = requests.get(url)
-        if r.status_code == 200:
+        headers = {}
+        if self._user_data is not None and self._user_data_etag:
+            headers['If-None-Match'] = self._user_data_etag
+
+        r = self.session.transport.get(url, headers=headers, auth=self.auth, timeout=self._user_data_timeout)
+        if r.status_code == 304:
+            content = self._user_data
+        elif r.status_code == 200:
             content = r.json()
+            self._user_data_etag = r.headers.get('ETag')
         else:
             raise Exception('Error retrieving user data from server')
 
+        self._user_data = content
+        self._user_data_time = now
+
         return content
 
 
@@ -6,78 +6,168 @@ import inspect
 
 def viztype(VizType):
 
+    # get desired function name if different than plot type
+    if hasattr(VizType, '_func'):
+        func = VizType._func
+    else:
+        func = VizType._name
+
     # wrapper that passes inputs to cleaning function and creates viz
     @wraps(VizType.clean)
     def plotter(self, *args, **kwargs):
+        args, kwargs = bind(VizType, args, kwargs)
+        return plot(self, VizType, args, kwargs)
+
+    # manually assign a plot-specific name (instead of 'clean')
+    plotter.__name__ = func
 
-        if kwargs['height'] is None and kwargs['width'] is None:
-            if self.size != 'full':
-                kwargs['width'] = SIZES[self.size]
+    if plotter.__doc__:
+        plotter.__doc__ += Base._doc
 
-        if self.local_enabled:
-            if hasattr(VizType, '_local') and VizType._local == False:
-                name = VizType._func if hasattr(VizType, 'func') else VizType._name
-                print("Plots of type '%s' not yet supported in local mode" % name)
-            else:
-                viz = VizType._baseplot_local(VizType._name, *args, **kwargs)
-                return viz
+    # give the generated function the signature of the clean method plus options
+    if hasattr(inspect, 'signature'):
+        plotter.__signature__ = signature(VizType)
 
+    # add plotter to class
+    setattr(Lightning, func, plotter)
+    REGISTRY[func] = VizType
+
+    return VizType
+
+
+def plot(lgn, VizType, args, kwargs, register=True):
+    """
+    Clean the inputs for a plot type and create the visualization.
+
+    Expects the positional arguments of the plot type's clean method,
+    and all of its options as keyword arguments (see bind). If register
+    is False the visualization is not added to the session, so that the
+    caller can do so in a deterministic order.
+    """
+
+    if kwargs['height'] is None and kwargs['width'] is None:
+        if lgn.size != 'full':
+            kwargs['width'] = SIZES[lgn.size]
+
+    if lgn.local_enabled:
+        if hasattr(VizType, '_local') and VizType._local == False:
+            name = VizType._func if hasattr(VizType, 'func') else VizType._name
+            print("Plots of type '%s' not yet supported in local mode" % name)
         else:
-            if not hasattr(self, 'session'):
-                self.create_session()
-            if VizType._name == 'plot':
-                if 'type' not in kwargs:
-                    raise ValueError("Must specify a type for custom plots")
-                else:
-                    type = kwargs['type']
-                    del kwargs['type']
-                viz = VizType._baseplot(self.session, type, *args, **kwargs)
-            else:
-                viz = VizType._baseplot(self.session, VizType._name, *args, **kwargs)
-            self.session.visualizations.append(viz)
+            viz = VizType._baseplot_local(VizType._name, *args, **kwargs)
             return viz
 
-    # get desired function name if different than plot type
-    if hasattr(VizType, '_func'):
-        func = VizType._func
     else:
-        func = VizType._name
+        if not hasattr(lgn, 'session'):
+            lgn.create_session()
+        if VizType._name == 'plot':
+            if 'type' not in kwargs:
+                raise ValueError("Must specify a type for custom plots")
+            else:
+                type = kwargs['type']
+                del kwargs['type']
+            viz = VizType._baseplot(lgn.session, type, *args, **kwargs)
+        else:
+            viz = VizType._baseplot(lgn.session, VizType._name, *args, **kwargs)
+        if register:
+            lgn.session.visualizations.append(viz)
+        return viz
+
+
+def bind(VizType, args, kwargs):
+    """
+    Split plotting arguments into clean arguments and options.
+
+    Returns the arguments of the plot type's clean method as a positional
+    list, and a dictionary with every option of the plot type, filled in
+    with defaults where not provided.
+    """
 
-    # crazy hack to give the dynamically generated function the correct signature
-    # based on: http://emptysqua.re/blog/copying-a-python-functions-signature/
-    # NOTE currently only handles functions with keyword arguments with defaults of None
+    spec = getargspec(VizType.clean)
+    names = spec.args
+    defaults = spec.defaults or ()
+    func = VizType._func if hasattr(VizType, '_func') else VizType._name
 
     options = {}
     if hasattr(VizType, '_options'):
         options = VizType._options
 
-    def parse(val):
-        if isinstance(val, str):
-            return "'" + val + "'"
+    # options can follow the clean arguments positionally
+    positional = names + list(options.keys())
+    if len(args) > len(positional):
+        raise TypeError("%s() takes at most %g arguments (%g given)" % (func, len(positional), len(args)))
+
+    values = dict(zip(names[len(names) - len(defaults):], defaults))
+    opts = dict((key, value.get('default')) for (key, value) in options.items())
+    for key, value in zip(positional, args):
+        if key in options:
+            opts[key] = value
+        else:
+            values[key] = value
+
+    for key, value in kwargs.items():
+        if key in positional[:len(args)]:
+            raise TypeError("%s() got multiple values for argument '%s'" % (func, key))
+        elif key in names:
+            values[key] = value
+        elif key in options:
+            opts[key] = value
         else:
-            return val
+            raise TypeError("%s() got an unexpected keyword argument '%s'" % (func, key))
 
-    formatted_options = ', '.join(['%s=%s' % (key, parse(value.get('default'))) for (key, value) in options.items()])
-    argspec = inspect.getargspec(VizType.clean)
-    formatted_args = inspect.formatargspec(*argspec)
-    fndef = 'lambda self, %s, %s: plotter(self,%s, %s)' \
-            % (formatted_args.lstrip('(').rstrip(')'),
-               formatted_options, formatted_args[1:].replace('=None', '').rstrip(')'),
-               ', '.join('%s=%s' % (key, key) for key in options.keys()))
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise TypeError("%s() missing required arguments: %s" % (func, ', '.join(missing)))
 
-    fake_fn = eval(fndef, {'plotter': plotter})
-    plotter = wraps(VizType.clean)(fake_fn)
+    return [values[name] for name in names], opts
 
-    # manually assign a plot-specific name (instead of 'clean')
-    plotter.__name__ = func
 
-    if plotter.__doc__:
-        plotter.__doc__ += Base._doc
+def signature(VizType):
+    """
+    Signature of the plotting method for a plot type: self, the arguments
+    of the clean method, and then the options with their defaults.
+    """
 
-    # add plotter to class
-    setattr(Lightning, func, plotter)
+    Parameter = inspect.Parameter
+    params = [Parameter('self', Parameter.POSITIONAL_OR_KEYWORD)]
+    params += list(inspect.signature(VizType.clean).parameters.values())
 
-    return VizType
+    options = {}
+    if hasattr(VizType, '_options'):
+        options = VizType._options
+
+    params += [Parameter(key, Parameter.POSITIONAL_OR_KEYWORD, default=value.get('default'))
+               for (key, value) in options.items()]
+
+    return inspect.Signature(params)
+
+
+def lookup(type):
+    """
+    Find a registered plot type by function name (e.g. 'graphbundled')
+    or by plot name (e.g. 'graph-bundled').
+    """
+
+    from lightning import _load_types
+    _load_types()
+
+    if type in REGISTRY:
+        return REGISTRY[type]
+
+    for VizType in REGISTRY.values():
+        if VizType._name == type:
+            return VizType
+
+    raise ValueError("Unknown plot type '%s'" % type)
+
+
+try:
+    getargspec = inspect.getfullargspec
+except AttributeError:
+    getargspec = inspect.getargspec
+
+# plot types by function name, used to generate other clients (e.g. AsyncLightning)
+REGISTRY = {}
 
 SIZES = {
     'small': 400,
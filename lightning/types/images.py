@@ -2,7 +2,8 @@ from numpy import ndarray, asarray
 
 from lightning.types.base import Base
 from lightning.types.decorators import viztype
-from lightning.types.utils import add_property, array_to_im, polygon_to_points, polygon_to_mask
+from lightning.types.utils import add_property, array_to_im, arrays_to_ims, polygon_to_points, polygon_to_mask, \
+    tile_pyramid, polygons_to_labels
 
 
 @viztype
@@ -11,7 +12,7 @@ class Image(Base):
     _local = False
 
     @staticmethod
-    def clean(imagedata):
+    def clean(imagedata, tiles=None):
         """
         Display an array as an image.
 
@@ -21,14 +22,29 @@ class Image(Base):
         ----------
         imagedata : array-like
             Image as a two dimensional (grayscale) or three dimensional (RGB) array.
+
+        tiles : boolean or int, optional, default=None
+            Whether to send the image as a pyramid of tiles at successive 2x downsampled
+            levels, coarsest first, for very large images. An integer sets the tile
+            size in pixels, by default 512.
         """
         if asarray(imagedata).ndim not in set((2, 3)):
             raise Exception("Input must be two or three dimensional")
 
+        if tiles:
+            return _tiled(imagedata, tiles)
+
         outdict = [array_to_im(imagedata)]
 
         return {'images': outdict}
 
+
+def _tiled(imagedata, tiles):
+    tilesize = 512 if tiles is True else tiles
+    pyramid, ims = tile_pyramid(imagedata, tilesize)
+    return {'images': ims, 'pyramid': pyramid}
+
+
 @viztype
 class ImagePoly(Base):
     _name = 'image-poly'
@@ -36,7 +52,7 @@ class ImagePoly(Base):
     _local = False
     
     @staticmethod
-    def clean(imagedata, polygons=None, xy=None):
+    def clean(imagedata, polygons=None, xy=None, tiles=None):
         """
         Display an array as an image with polygonal regions and region drawing.
 
@@ -54,12 +70,18 @@ class ImagePoly(Base):
 
         xy : boolean, optional, default = None
             Only if True treat coordinates as x/y positions instead of row/column indices
+
+        tiles : boolean or int, optional, default=None
+            Whether to send the image as a pyramid of tiles (see image). Polygon
+            coordinates are always in full resolution pixels.
         """
         if asarray(imagedata).ndim not in set((2, 3)):
             raise Exception("Input must be two or three dimensional")
 
-        imgs = [array_to_im(imagedata)]
-        outdict = {'images': imgs}
+        if tiles:
+            outdict = _tiled(imagedata, tiles)
+        else:
+            outdict = {'images': [array_to_im(imagedata)]}
         outdict = add_property(outdict, polygons, 'coordinates', xy=xy)
 
         return outdict
@@ -114,6 +136,21 @@ class ImagePoly(Base):
         coords = self._coords()
         return [polygon_to_mask(x, dims, z) for x in coords]
 
+    def label_image(self, dims):
+        """
+        Integer label image with all regions drawn on an image.
+
+        Pixels in the i-th region are labeled i + 1, with later regions
+        taking precedence where regions overlap, and 0 elsewhere.
+
+        Parameters
+        ----------
+        dims : array-like
+            Specify the dimensions of the image containing the polygons
+        """
+        coords = self._coords()
+        return polygons_to_labels(coords, dims)
+
 
 @viztype
 class Gallery(Base):
@@ -137,6 +174,6 @@ class Gallery(Base):
         if isinstance(imagedata, ndarray):
             imagedata = [imagedata]
 
-        outdict = [array_to_im(im) for im in imagedata]
+        outdict = arrays_to_ims(imagedata)
 
         return {'images': outdict}
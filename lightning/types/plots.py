@@ -1,7 +1,9 @@
 from lightning.types.base import Base
 from lightning.types.decorators import viztype
 from lightning.types.utils import array_to_lines, vecs_to_points, \
-    parse_links, add_property, mat_to_array, list_to_regions, parse_nodes, ndarray
+    parse_links, add_property, mat_to_array, list_to_regions, parse_nodes, ndarray, downsample_series, \
+    decimate, bin_values, bin_values_2d, value_range, matrix_to_im, check_colormap
+from numpy import size
 
 
 @viztype
@@ -52,7 +54,7 @@ class Scatter(Base):
 
     @staticmethod
     def clean(x, y, labels=None, values=None, color=None, group=None, colormap=None,
-              size=None, alpha=None, xaxis=None, yaxis=None):
+              size=None, alpha=None, xaxis=None, yaxis=None, max_points=None):
         """
         Plot two-dimensional data as points.
 
@@ -98,6 +100,11 @@ class Scatter(Base):
 
         brush : boolean, optional, default=True
             Whether to support brushing
+
+        max_points : int, optional, default=None
+            If set, send at most this many points, thinning dense regions while
+            keeping points in sparse regions and outliers. Selections still
+            refer to indices of the original data.
         """
 
         points = vecs_to_points(x, y)
@@ -113,6 +120,9 @@ class Scatter(Base):
         outdict = add_property(outdict, xaxis, 'xaxis')
         outdict = add_property(outdict, yaxis, 'yaxis')
 
+        if max_points is not None:
+            outdict = decimate(outdict, max_points)
+
         return outdict
 
     def selected(self):
@@ -121,7 +131,7 @@ class Scatter(Base):
         """
         user_data = self._get_user_data()['settings']
         if 'selected' in user_data.keys():
-            return user_data['selected']
+            return self._original_indices(user_data['selected'])
         else:
             return []
 
@@ -145,7 +155,7 @@ class Matrix(Base):
     )
 
     @staticmethod
-    def clean(matrix, colormap=None, row_labels=None, column_labels=None):
+    def clean(matrix, colormap=None, row_labels=None, column_labels=None, raster=None):
         """
         Visualize a dense matrix or table as a heat map.
 
@@ -167,10 +177,29 @@ class Matrix(Base):
 
         numbers : boolean, optional, default=True
             Whether to show numbers on cells
+
+        raster : boolean or int, optional, default=None
+            Whether to render the colormapped matrix as an image, with one pixel
+            per cell, instead of sending every value. An integer sets the number
+            of cells above which to render, by default 250000.
         """
 
         matrix = mat_to_array(matrix)
-        outdict = {'matrix': matrix}
+
+        threshold = 250000
+        if raster is not None and not isinstance(raster, bool):
+            threshold, raster = raster, None
+        if raster is None:
+            raster = matrix.size > threshold
+
+        if raster:
+            if colormap is not None:
+                check_colormap(colormap)
+            vmin, vmax = value_range(matrix)
+            outdict = {'images': [matrix_to_im(matrix, colormap, vmin, vmax)],
+                       'shape': list(matrix.shape), 'range': [vmin, vmax]}
+        else:
+            outdict = {'matrix': matrix}
 
         outdict = add_property(outdict, colormap, 'colormap')
         outdict = add_property(outdict, row_labels, 'rowLabels')
@@ -200,8 +229,8 @@ class Adjacency(Base):
         ----------
         conn : array-like, (n,n) or (n,3) or (n,2)
             Input connectivity data as either a matrix or a list of links.
-            Matrix can be binary or continuous valued. Links should contain
-            either 2 elements per link (source, target),
+            Matrix can be binary or continuous valued, and can be a scipy.sparse
+            matrix. Links should contain either 2 elements per link (source, target),
             or 3 elements (source, target, value).
 
         labels : array-like, (n,)
@@ -240,7 +269,8 @@ class Line(Base):
     )
 
     @staticmethod
-    def clean(series, index=None, color=None, group=None, thickness=None, xaxis=None, yaxis=None):
+    def clean(series, index=None, color=None, group=None, thickness=None, xaxis=None, yaxis=None,
+              max_points=None, downsample=None):
         """
         Plot one-dimensional series data as lines.
 
@@ -272,9 +302,19 @@ class Line(Base):
 
         zoom : boolean, optional, default=True
             Whether to allow zooming
+
+        max_points : int, optional, default=None
+            If set, reduce each series to at most this many samples before sending,
+            keeping the index consistent with the reduced series.
+
+        downsample : str, optional, default='lttb'
+            Method for reducing series with max_points, either 'lttb'
+            (Largest-Triangle-Three-Buckets) or 'minmax' (bucket minima and maxima)
         """
 
         series = array_to_lines(series)
+        if max_points is not None:
+            series, index = downsample_series(series, index, max_points, method=downsample)
         outdict = {'series': series}
 
         outdict = add_property(outdict, color, 'color')
@@ -308,8 +348,8 @@ class Force(Base):
         ----------
         conn : array-like, (n,n) or (n,3) or (n,2)
             Input connectivity data as either a matrix or a list of links.
-            Matrix can be binary or continuous valued. Links should contain
-            either 2 elements per link (source, target),
+            Matrix can be binary or continuous valued, and can be a scipy.sparse
+            matrix. Links should contain either 2 elements per link (source, target),
             or 3 elements (source, target, value).
 
         values : array-like, optional, singleton or (n,)
@@ -380,8 +420,8 @@ class Circle(Base):
         ----------
         conn : array-like, (n,n) or (n,3) or (n,2)
             Input connectivity data as either a matrix or a list of links.
-            Matrix can be binary or continuous valued. Links should contain
-            either 2 elements per link (source, target),
+            Matrix can be binary or continuous valued, and can be a scipy.sparse
+            matrix. Links should contain either 2 elements per link (source, target),
             or 3 elements (source, target, value).
 
         group : array-like, optional, (m,n) or (n,)
@@ -445,8 +485,8 @@ class Graph(Base):
 
         conn : array-like, (n,n) or (n,3) or (n,2)
             Input connectivity data as either a matrix or a list of links.
-            Matrix can be binary or continuous valued. Links should contain
-            either 2 elements per link (source, target),
+            Matrix can be binary or continuous valued, and can be a scipy.sparse
+            matrix. Links should contain either 2 elements per link (source, target),
             or 3 elements (source, target, value).
 
         values : array-like, optional, singleton or (n,)
@@ -518,8 +558,8 @@ class GraphBundled(Base):
 
         conn : array-like, (n,n) or (n,3) or (n,2)
             Input connectivity data as either a matrix or a list of links.
-            Matrix can be binary or continuous valued. Links should contain
-            either 2 elements per link (source, target),
+            Matrix can be binary or continuous valued, and can be a scipy.sparse
+            matrix. Links should contain either 2 elements per link (source, target),
             or 3 elements (source, target, value).
 
         values : array-like, optional, singleton or (n,)
@@ -607,7 +647,7 @@ class Histogram(Base):
     )
 
     @staticmethod
-    def clean(values, bins=None):
+    def clean(values, bins=None, log=False, binned=None):
         """
         Create a histogram.
 
@@ -618,17 +658,90 @@ class Histogram(Base):
         values : list
             Values to plot a histogram of
 
-        bins : number, optional
+        bins : number, str, or array-like, optional
             Number of bins to used in the histogram. If unspecified
-            will default to sqrt(len(values))
+            will default to sqrt(len(values)). When binning in Python,
+            can also be a numpy bin estimator such as 'auto', or
+            explicit bin edges.
+
+        log : boolean, optional, default=False
+            Whether to space bins evenly on a log scale, binning in Python.
+            Non-positive values are ignored. Cannot be used with binned=False.
+
+        binned : boolean or int, optional, default=None
+            Whether to bin in Python and send only bin edges and counts.
+            An integer sets the number of values above which to bin,
+            by default binning when there are more than 10000 values.
         """
 
-        outdict = {'values': values}
-        outdict = add_property(outdict, bins, 'bins')
+        threshold = 10000
+        if binned is not None and not isinstance(binned, bool):
+            threshold, binned = binned, None
+        if binned is None:
+            binned = log or isinstance(bins, str) or size(bins) > 1 or size(values) > threshold
+        elif not binned and log:
+            raise ValueError("Log spaced bins require binning in Python, set binned=True")
+
+        if not binned:
+            outdict = {'values': values}
+            outdict = add_property(outdict, bins, 'bins')
+            return outdict
+
+        counts, edges = bin_values(values, bins=bins, log=log)
+        outdict = {'counts': counts, 'edges': edges}
 
         return outdict
 
 
+@viztype
+class Histogram2D(Base):
+
+    _name = 'matrix'
+    _func = 'histogram2d'
+    _options = dict(Base._options, **{
+        'numbers': {'default': False}
+        }
+    )
+
+    @staticmethod
+    def clean(x, y, bins=10, log=False, colormap=None):
+        """
+        Create a two-dimensional histogram, shown as a heat map.
+
+        Values are binned in Python, and only the counts and bin edges are sent.
+        Rows of the heat map correspond to bins of y, and columns to bins of x.
+
+        Parameters
+        ----------
+        x, y : array-like, each (n,)
+            Values to plot a histogram of
+
+        bins : number, str, or array-like, optional, default=10
+            Number of bins, a numpy bin estimator such as 'auto', or explicit
+            bin edges, used for both axes or given separately as (xbins, ybins)
+
+        log : boolean, optional, default=False
+            Whether to space bins evenly on a log scale, for both axes or
+            given separately as (xlog, ylog)
+
+        colormap : string
+            Specification of color map, only colorbrewer types supported
+        """
+
+        counts, xedges, yedges = bin_values_2d(x, y, bins=bins, log=log)
+        outdict = {'matrix': counts.T}
+
+        outdict = add_property(outdict, colormap, 'colormap')
+        outdict = add_property(outdict, _edge_labels(yedges), 'rowLabels')
+        outdict = add_property(outdict, _edge_labels(xedges), 'columnLabels')
+
+        return outdict
+
+
+def _edge_labels(edges):
+    return ['%.3g to %.3g' % (lo, hi) for (lo, hi) in zip(edges[:-1], edges[1:])]
+
+
 @viztype
 class VegaLite(Base):
 
@@ -1,6 +1,7 @@
 from lightning.types.base import Base
 from lightning.types.decorators import viztype
-from lightning.types.utils import array_to_lines, vecs_to_points, add_property
+from lightning.types.utils import array_to_lines, vecs_to_points, add_property, downsample_series, \
+    decimate
 
 
 @viztype
@@ -14,9 +15,11 @@ class LineStreaming(Base):
         'zoom': {'default': False}
         }
     )
+    _stream_fields = {'series': -1, 'index': 0}
 
     @staticmethod
-    def clean(series, index=None, color=None, group=None, size=None, xaxis=None, yaxis=None):
+    def clean(series, index=None, color=None, group=None, size=None, xaxis=None, yaxis=None,
+              max_points=None, downsample=None):
         """
         Plot streaming one-dimensional series data as updating lines.
 
@@ -51,9 +54,20 @@ class LineStreaming(Base):
 
         max_width : int, optional, default = 50
             The maximum number of time points to show before plot shifts.
+
+        max_points : int, optional, default=None
+            If set, reduce each series to at most this many samples before sending,
+            keeping the index consistent with the reduced series
+            (when appending, pass an index so reduced data lines up with earlier data).
+
+        downsample : str, optional, default='lttb'
+            Method for reducing series with max_points, either 'lttb'
+            (Largest-Triangle-Three-Buckets) or 'minmax' (bucket minima and maxima)
         """
 
         series = array_to_lines(series)
+        if max_points is not None:
+            series, index = downsample_series(series, index, max_points, method=downsample)
         outdict = {'series': series}
 
         outdict = add_property(outdict, color, 'color')
@@ -78,9 +92,11 @@ class ScatterStreaming(Base):
         'tooltips': {'default': False},
         }
     )
+    _stream_fields = {'points': 0, 'values': 0, 'labels': 0, 'group': 0, 'color': 0, 'size': 0}
 
     @staticmethod
-    def clean(x, y, values=None, labels=None, group=None, color=None, colormap=None, size=None, xaxis=None, yaxis=None):
+    def clean(x, y, values=None, labels=None, group=None, color=None, colormap=None, size=None,
+              xaxis=None, yaxis=None, max_points=None):
         """
         Create a streaming scatter plot of x and y.
 
@@ -118,6 +134,10 @@ class ScatterStreaming(Base):
 
         yaxis : str, optional, default = None
             Label for y-axis
+
+        max_points : int, optional, default=None
+            If set, send at most this many points, thinning dense regions while
+            keeping points in sparse regions and outliers.
         """
 
         points = vecs_to_points(x, y)
@@ -132,4 +152,7 @@ class ScatterStreaming(Base):
         outdict = add_property(outdict, xaxis, 'xaxis')
         outdict = add_property(outdict, yaxis, 'yaxis')
 
+        if max_points is not None:
+            outdict = decimate(outdict, max_points)
+
         return outdict
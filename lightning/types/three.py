@@ -1,8 +1,8 @@
 from lightning.types.base import Base
 from lightning.types.decorators import viztype
-from lightning.types.utils import vecs_to_points_three, add_property
+from lightning.types.utils import vecs_to_points_three, add_property, decimate
 from numpy import ndarray, asarray
-from lightning.types.utils import array_to_im
+from lightning.types.utils import arrays_to_ims, pack_images
 
 @viztype
 class Scatter3(Base):
@@ -11,7 +11,7 @@ class Scatter3(Base):
     _func = 'scatter3'
 
     @staticmethod
-    def clean(x, y, z, color=None, group=None, alpha=None, size=None):
+    def clean(x, y, z, color=None, group=None, alpha=None, size=None, max_points=None):
         """
         Plot three-dimensional data as points.
 
@@ -34,6 +34,10 @@ class Scatter3(Base):
         alpha : array-like, optional, singleton or (n,)
             Single alpha value or array to set fill and stroke opacity
 
+        max_points : int, optional, default=None
+            If set, send at most this many points, thinning dense regions while
+            keeping points in sparse regions and outliers.
+
         """
 
         points = vecs_to_points_three(x, y, z)
@@ -44,6 +48,9 @@ class Scatter3(Base):
         outdict = add_property(outdict, size, 'size')
         outdict = add_property(outdict, alpha, 'alpha')
 
+        if max_points is not None:
+            outdict = decimate(outdict, max_points)
+
         return outdict
 
 
@@ -53,7 +60,7 @@ class Volume(Base):
     _name = 'volume'
 
     @staticmethod
-    def clean(imagedata):
+    def clean(imagedata, packed=None, compression=None):
         """
         Display a collection of images as a three-dimensional volume.
 
@@ -63,11 +70,22 @@ class Volume(Base):
         ----------
         imagedata : array-like, or list of array-like
             Image or list of images as two dimensional (grayscale) or three dimensional (RGB) arrays.
+
+        packed : boolean, optional, default=None
+            If True upload the whole stack as a single binary blob with shape
+            and dtype metadata in one request, instead of one image per request.
+            All images must have the same dimensions. Not supported in local mode.
+
+        compression : str, optional, default=None
+            Compression for packed uploads, either None or 'zlib'
         """
 
+        if packed:
+            return {'packed': pack_images(imagedata, compression=compression)}
+
         if isinstance(imagedata, ndarray):
             imagedata = [imagedata]
 
-        outdict = [array_to_im(im) for im in imagedata]
+        outdict = arrays_to_ims(imagedata)
 
         return {'images': outdict}
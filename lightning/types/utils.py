@@ -1,6 +1,6 @@
 from numpy import asarray, array, ndarray, vstack, newaxis, nonzero, concatenate, \
-    transpose, atleast_2d, size, isscalar, meshgrid, where, zeros, ones
-from matplotlib.path import Path
+    transpose, atleast_2d, size, isscalar, where, zeros, ones, \
+    ascontiguousarray, uint8, uint16, arange, floor, ceil, linspace, cumsum, empty, unique
 import ast
 
 
@@ -49,7 +49,7 @@ def check_coordinates(co, xy=None):
     if not (isinstance(co[0][0], list) or isinstance(co[0][0], tuple)):
         co = [co]
     if xy is not True:
-        co = map(lambda p: asarray(p)[:, ::-1].tolist(), co)
+        co = [asarray(p)[:, ::-1].tolist() for p in co]
     return co
 
 
@@ -170,6 +170,314 @@ def array_to_lines(data):
     return data
 
 
+def downsample_series(series, index=None, max_points=None, method=None):
+    """
+    Reduce series to at most max_points samples each, sharing one index.
+
+    Uses Largest-Triangle-Three-Buckets ('lttb', the default), which keeps
+    the visual shape of lines, or 'minmax', which keeps the minimum and
+    maximum of each bucket. With several series the same samples are kept
+    for all of them, so the returned index stays consistent with every series.
+    If no index was given, the returned index holds the positions of the
+    kept samples in the original series.
+
+    Parameters
+    ----------
+    series : array-like, (m,) or (n,m)
+        One series or n series of length m
+
+    index : array-like, (m,), optional, default=None
+        Index for the x-axis of the series
+
+    max_points : int
+        Maximum number of samples to keep per series
+
+    method : str, optional, default='lttb'
+        Either 'lttb' or 'minmax'
+    """
+    series = asarray(series)
+    if series.ndim not in (1, 2) or series.dtype.kind not in 'biuf':
+        raise Exception("Series must be numeric and one or two-dimensional to downsample")
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3 to downsample")
+
+    ys = atleast_2d(series)
+    m = ys.shape[1]
+
+    x = arange(m) if index is None else asarray(index)
+    if x.shape != (m,):
+        raise Exception("Index must have the same length as the series")
+
+    if method is None or method == 'lttb':
+        keep = lttb_indices(x, ys, max_points)
+    elif method == 'minmax':
+        keep = minmax_indices(ys, max_points)
+    else:
+        raise ValueError("Downsampling method must be one of 'lttb', 'minmax'")
+
+    if len(keep) == m:
+        return series, index
+
+    series = ys[:, keep] if series.ndim == 2 else series[keep]
+    return series, x[keep]
+
+
+def lttb_indices(x, ys, n_out):
+    """
+    Indices of samples kept by Largest-Triangle-Three-Buckets.
+
+    The first and last samples are always kept, and one sample is picked
+    from each bucket in between, the one forming the largest triangle with
+    the previously kept sample and the average of the next bucket (summed
+    over all series when there are several).
+    """
+    m = len(x)
+    if n_out < 3:
+        raise ValueError("Must keep at least 3 samples")
+    if n_out >= m:
+        return arange(m)
+
+    x = x.astype('float64')
+    ys = ys.astype('float64')
+
+    # n_out - 2 buckets over the samples between the first and the last
+    edges = floor(linspace(1, m - 1, n_out - 1)).astype('int')
+    edges[-1] = m - 1
+
+    # averages of every bucket at once, with the last sample as the final bucket
+    starts = concatenate([edges[:-1], [m - 1]])
+    stops = concatenate([edges[1:], [m]])
+    counts = (stops - starts).astype('float64')
+    cx = concatenate([[0], cumsum(x)])
+    cy = concatenate([zeros((ys.shape[0], 1)), cumsum(ys, axis=1)], axis=1)
+    avg_x = (cx[stops] - cx[starts]) / counts
+    avg_y = (cy[:, stops] - cy[:, starts]) / counts
+
+    keep = empty(n_out, dtype='int')
+    keep[0] = 0
+    keep[-1] = m - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = starts[i], stops[i]
+        ax, ay = x[a], ys[:, a:a + 1]
+        area = abs((ax - avg_x[i + 1]) * (ys[:, lo:hi] - ay)
+                   - (ax - x[lo:hi]) * (avg_y[:, i + 1:i + 2] - ay)).sum(axis=0)
+        a = lo + area.argmax()
+        keep[i + 1] = a
+
+    return keep
+
+
+def minmax_indices(ys, n_out):
+    """
+    Indices of the minimum and maximum sample of each bucket.
+
+    The first and last samples are always kept. With several series the
+    union over series is kept, so the number of buckets is reduced to keep
+    the total at most n_out.
+    """
+    k, m = ys.shape
+    if n_out >= m:
+        return arange(m)
+    buckets = (n_out - 2) // (2 * k)
+    if buckets < 1:
+        return array([0, m - 1])
+
+    # equal sized buckets, padding the end by repeating the last sample
+    width = int(ceil(m / float(buckets)))
+    padded = concatenate([ys, ys[:, -1:].repeat(buckets * width - m, axis=1)], axis=1)
+    padded = padded.reshape(k, buckets, width)
+    offsets = (arange(buckets) * width)[newaxis, :]
+    lows = padded.argmin(axis=2) + offsets
+    highs = padded.argmax(axis=2) + offsets
+
+    keep = unique(concatenate([[0, m - 1], lows.ravel(), highs.ravel()]))
+    return keep[keep < m]
+
+
+def decimate_points(points, max_points, seed=0):
+    """
+    Indices of at most max_points points, stratified over a grid.
+
+    Points are binned into a grid with roughly max_points cells, and every
+    cell keeps up to the same number of points, chosen as large as the
+    budget allows. Cells in sparse regions (including outliers) keep all
+    their points, while dense cores are thinned at random. Returns the
+    kept indices in their original order.
+
+    Parameters
+    ----------
+    points : array-like, (n,d)
+        Point coordinates
+
+    max_points : int
+        Maximum number of points to keep
+
+    seed : int, optional, default=0
+        Seed for choosing points within dense cells, so results are repeatable
+    """
+    from numpy import clip, ravel_multi_index, lexsort, flatnonzero, diff, repeat, minimum, sort
+    from numpy.random import RandomState
+
+    points = asarray(points, dtype='float64')
+    n, d = points.shape
+    if n <= max_points:
+        return arange(n)
+
+    cells = max(int(round(max_points ** (1.0 / d))), 1)
+    lo = points.min(axis=0)
+    span = points.max(axis=0) - lo
+    span[span == 0] = 1
+    coords = clip(((points - lo) / span * cells).astype('int'), 0, cells - 1)
+    cell = ravel_multi_index(coords.T, (cells,) * d)
+
+    # order points by cell, in random order within each cell
+    rng = RandomState(seed)
+    order = lexsort((rng.rand(n), cell))
+    starts = concatenate([[0], flatnonzero(diff(cell[order])) + 1])
+    counts = diff(concatenate([starts, [n]]))
+
+    # largest per-cell cap that keeps the total within budget
+    low, high = 0, int(counts.max())
+    while low < high:
+        mid = (low + high + 1) // 2
+        if minimum(counts, mid).sum() <= max_points:
+            low = mid
+        else:
+            high = mid - 1
+    cap = max(low, 1)
+
+    ranks = arange(n) - repeat(starts, counts)
+    keep = order[ranks < cap]
+    if len(keep) > max_points:
+        # more occupied cells than the budget, keep a random subset of them
+        keep = rng.choice(keep, max_points, replace=False)
+
+    return sort(keep)
+
+
+def decimate(outdict, max_points, properties=('color', 'group', 'size', 'alpha', 'labels', 'values')):
+    """
+    Decimate the points of a cleaned scatter plot and its per-point properties.
+
+    Properties with one value per point are subset in the same way, and the
+    kept indices into the original data are stored under '_indices'.
+    """
+    points = outdict['points']
+    n = len(points)
+    keep = decimate_points(points, max_points)
+    if len(keep) == n:
+        return outdict
+
+    outdict['points'] = points[keep]
+    for name in properties:
+        if name in outdict:
+            prop = asarray(outdict[name])
+            if prop.ndim > 0 and len(prop) == n:
+                outdict[name] = prop[keep]
+    outdict['_indices'] = keep
+
+    return outdict
+
+
+def _bin_edges(values, bins, log):
+    """
+    Bin edges for values, with bins given as a count, a numpy estimator
+    name such as 'auto', or explicit edges.
+    """
+    from numpy import histogram_bin_edges, log10, sqrt
+
+    if bins is None:
+        bins = max(int(sqrt(len(values))), 1)
+    if not isinstance(bins, str):
+        if size(bins) > 1:
+            return asarray(bins, dtype='float64')
+        bins = int(bins)
+    if log:
+        return 10 ** histogram_bin_edges(log10(values), bins)
+    return histogram_bin_edges(values, bins)
+
+
+def bin_values(values, bins=None, log=False):
+    """
+    Histogram counts and bin edges for a set of values.
+
+    Non-finite values are ignored, as are non-positive values when
+    binning on a log scale.
+
+    Parameters
+    ----------
+    values : array-like
+        Values to bin
+
+    bins : int, str, or array-like, optional, default=None
+        Number of bins, a numpy bin estimator such as 'auto',
+        or explicit bin edges. Defaults to sqrt(len(values)) bins.
+
+    log : boolean, optional, default=False
+        Whether to space the bins evenly on a log scale
+    """
+    from numpy import histogram, isfinite
+
+    values = asarray(values, dtype='float64').ravel()
+    keep = isfinite(values)
+    if log:
+        keep &= values > 0
+    values = values[keep]
+
+    edges = _bin_edges(values, bins, log)
+    counts, edges = histogram(values, bins=edges)
+
+    return counts, edges
+
+
+def bin_values_2d(x, y, bins=10, log=False):
+    """
+    Two-dimensional histogram counts and bin edges for paired values.
+
+    Parameters
+    ----------
+    x, y : array-like, each (n,)
+        Values to bin
+
+    bins : int, str, array-like, or pair, optional, default=10
+        Bin specification as for bin_values, shared by both axes
+        or given separately as a pair (xbins, ybins).
+
+    log : boolean or pair, optional, default=False
+        Whether to space the bins evenly on a log scale, for both
+        axes or separately as a pair
+    """
+    from numpy import histogram2d, isfinite
+
+    x = asarray(x, dtype='float64').ravel()
+    y = asarray(y, dtype='float64').ravel()
+    if x.shape != y.shape:
+        raise ValueError("x and y must have the same length")
+
+    if isinstance(bins, (tuple, list)) and len(bins) == 2:
+        xbins, ybins = bins
+    else:
+        xbins, ybins = bins, bins
+    if isinstance(log, (tuple, list)):
+        xlog, ylog = log
+    else:
+        xlog, ylog = log, log
+
+    keep = isfinite(x) & isfinite(y)
+    if xlog:
+        keep &= x > 0
+    if ylog:
+        keep &= y > 0
+    x, y = x[keep], y[keep]
+
+    xedges = _bin_edges(x, xbins, xlog)
+    yedges = _bin_edges(y, ybins, ylog)
+    counts, xedges, yedges = histogram2d(x, y, bins=[xedges, yedges])
+
+    return counts, xedges, yedges
+
+
 def vecs_to_points(x, y):
         
     x = asarray(x)
@@ -213,35 +521,186 @@ def mat_to_array(mat):
     return mat
 
 
+def is_sparse(mat):
+    """
+    Whether input is a scipy.sparse matrix or array, checked without importing scipy.
+    """
+    return type(mat).__module__.startswith('scipy.sparse') and hasattr(mat, 'tocoo')
+
+
+def sparse_to_links(mat):
+    """
+    Links from the stored entries of a scipy.sparse matrix, in O(nnz).
+
+    Duplicate entries are summed and explicit zeros dropped, so the result
+    matches mat_to_links on the dense equivalent.
+    """
+    if not getattr(mat, 'has_canonical_format', False):
+        # converting to CSR sums duplicates in linear time, unlike sorting the COO entries
+        mat = mat.tocsr()
+        mat.sum_duplicates()
+    coo = mat.tocoo()
+
+    keep = nonzero(coo.data)[0]
+    links = empty((len(keep), 3))
+    links[:, 0] = coo.row[keep]
+    links[:, 1] = coo.col[keep]
+    links[:, 2] = coo.data[keep]
+
+    return links
+
+
 def mat_to_links(mat):
 
     # get nonzero entries as list with the source, target, and value as columns
-    
+
+    if is_sparse(mat):
+        return sparse_to_links(mat)
+
     mat = asarray(mat)
     if mat.ndim < 2:
             raise Exception('Matrix input must be two-dimensional')
 
     inds = nonzero(mat)
-    links = concatenate((transpose(nonzero(mat)), atleast_2d(mat[inds]).T), axis=1)
+    links = concatenate((transpose(inds), atleast_2d(mat[inds]).T), axis=1)
 
     return links
 
 
+class EdgeList(object):
+    """
+    A large edge list, validated and serialized in fixed-size chunks.
+
+    Wraps an (n,2) or (n,3) array of (source, target[, value]) rows, typically
+    memory-mapped from a .npy file, so that node counting, weight defaults,
+    and serialization hold at most one chunk of edges in memory at a time.
+
+    Parameters
+    ----------
+    data : array-like or str
+        Edge list array, or path to a .npy file that will be memory-mapped
+
+    chunksize : int, optional, default=100000
+        Number of edges processed at a time
+    """
+
+    def __init__(self, data, chunksize=100000):
+        if isinstance(data, str):
+            from numpy import load
+            data = load(data, mmap_mode='r')
+        if data.ndim != 2 or data.shape[1] not in (2, 3):
+            raise ValueError("Edge list must be two-dimensional with 2 or 3 entries per link, "
+                             "got shape %s" % (data.shape,))
+        self.data = data
+        self.chunksize = chunksize
+        self._nodes = None
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __repr__(self):
+        return 'EdgeList\nlinks: %d\n' % len(self)
+
+    def chunks(self):
+        """
+        Links as (m,3) arrays of (source, target, value), one chunk at a time.
+        """
+        for start in range(0, len(self), self.chunksize):
+            chunk = self.data[start:start + self.chunksize]
+            links = ones((len(chunk), 3))
+            links[:, :chunk.shape[1]] = chunk
+            yield links
+
+    def count_nodes(self):
+        """
+        Number of nodes, one more than the largest node index.
+
+        Node indices are checked to be finite and non-negative along the way.
+        """
+        if self._nodes is None:
+            from numpy import isfinite
+            top = -1
+            for links in self.chunks():
+                if not len(links):
+                    continue
+                if not isfinite(links).all():
+                    raise ValueError("Edge list contains non-finite values")
+                ends = links[:, :2]
+                if ends.min() < 0:
+                    raise ValueError("Node indices must be non-negative")
+                top = max(top, int(ends.max()))
+            self._nodes = top + 1
+        return self._nodes
+
+    def tolist(self):
+        out = []
+        for links in self.chunks():
+            out.extend(links.tolist())
+        return out
+
+    def iterjson(self):
+        """
+        JSON text of the links as a list of [source, target, value] rows, in pieces.
+        """
+        import json
+
+        yield '['
+        first = True
+        for links in self.chunks():
+            if not len(links):
+                continue
+            text = json.dumps(links.tolist())[1:-1]
+            yield text if first else ', ' + text
+            first = False
+        yield ']'
+
+
+def as_edge_list(data):
+    """
+    Wrap memory-mapped edge lists and paths to .npy files as an EdgeList.
+
+    Returns None for any other input.
+    """
+    from numpy import memmap
+
+    if isinstance(data, EdgeList):
+        return data
+    if isinstance(data, str) and data.endswith('.npy'):
+        return EdgeList(data)
+    if isinstance(data, memmap) and data.ndim == 2 and data.shape[0] != data.shape[1]:
+        return EdgeList(data)
+    return None
+
+
 def parse_nodes(data):
 
+    if is_sparse(data):
+        return list(range(0, max(data.shape)))
+
+    edges = as_edge_list(data)
+    if edges is not None:
+        return list(range(0, edges.count_nodes()))
+
     data = asarray(data)
 
     if data.shape[0] == data.shape[1]:
         nodes = list(range(0, len(data)))
 
     else:
-        nodes = list(range(0, int(max(max(data[:, 0]), max(data[:, 1])) + 1)))
+        nodes = list(range(0, int(data[:, :2].max()) + 1))
 
     return nodes
 
 
 def parse_links(data):
 
+    if is_sparse(data):
+        return sparse_to_links(data)
+
+    edges = as_edge_list(data)
+    if edges is not None:
+        return edges
+
     data = asarray(data)
 
     if data.shape[0] == data.shape[1]:
@@ -258,13 +717,39 @@ def parse_links(data):
     return links
 
 
-def array_to_im(im):
+def array_to_im(im, compression=None):
+    """
+    Encode an array as a PNG image.
+
+    Arrays that are already uint8 or uint16 grayscale, grayscale with alpha,
+    RGB, or RGBA are written directly (see array_to_png) without scaling.
+    Other arrays are normalized and colormapped with matplotlib.
+
+    Parameters
+    ----------
+    im : array-like, (h,w) or (h,w,c)
+        Image data
+
+    compression : int, optional, default=None
+        zlib compression level for directly written images,
+        defaults to the level set with set_png_compression
+    """
+
+    im = asarray(im)
+
+    if im.ndim not in (2, 3):
+        raise Exception("Images must be 2 or 3 dimensions")
+
+    if compression is None:
+        compression = _png['compression']
+
+    if im.dtype in (uint8, uint16) and (im.ndim == 2 or im.shape[2] in (1, 2, 3, 4)):
+        return array_to_png(im, compression)
 
     from matplotlib.pyplot import imsave
     from matplotlib.pyplot import cm
     import io
 
-    im = asarray(im)
     imfile = io.BytesIO()
     if im.ndim == 3:
         # if 3D, show as RGB
@@ -273,10 +758,327 @@ def array_to_im(im):
         # if 2D, show as grayscale
         imsave(imfile, im, format="png", cmap=cm.gray)
 
-    if im.ndim > 3:
+    return imfile.getvalue()
+
+
+def array_to_png(im, compression=6, palette=None):
+    """
+    Write a uint8 or uint16 array as a PNG without going through matplotlib.
+
+    Values are written as is, as grayscale (2D), or as grayscale with alpha,
+    RGB, or RGBA depending on the size of the third dimension.
+
+    Parameters
+    ----------
+    im : array-like, (h,w) or (h,w,c)
+        Image data with dtype uint8 or uint16
+
+    compression : int, optional, default=6
+        zlib compression level, from 0 (none, fastest) to 9 (smallest)
+
+    palette : array-like, (k,4), optional, default=None
+        RGBA color table with up to 256 uint8 entries, in which case im
+        must be a 2D uint8 array of indices into the table
+    """
+    import struct
+    import zlib
+
+    im = asarray(im)
+    if im.ndim == 3 and im.shape[2] == 1:
+        im = im[:, :, 0]
+
+    h, w = im.shape[:2]
+    channels = 1 if im.ndim == 2 else im.shape[2]
+    color_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+    depth = 8 if im.dtype == uint8 else 16
+
+    extra = []
+    if palette is not None:
+        palette = asarray(palette, dtype=uint8)
+        color_type = 3
+        extra = [(b'PLTE', palette[:, :3].tobytes()), (b'tRNS', palette[:, 3].tobytes())]
+
+    # rows of big-endian samples, each preceded by filter type 0
+    rows = ascontiguousarray(im.astype('>u%g' % (depth // 8))).view(uint8).reshape(h, -1)
+    raw = zeros((h, rows.shape[1] + 1), dtype=uint8)
+    raw[:, 1:] = rows
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + \
+            struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', w, h, depth, color_type, 0, 0, 0)
+    return b''.join([b'\x89PNG\r\n\x1a\n', chunk(b'IHDR', header)] +
+                    [chunk(tag, data) for (tag, data) in extra] +
+                    [chunk(b'IDAT', zlib.compress(raw.tobytes(), compression)),
+                     chunk(b'IEND', b'')])
+
+
+def value_range(mat):
+    """
+    Minimum and maximum of the finite values in a matrix, as floats.
+    """
+    from numpy import isfinite
+
+    mat = asarray(mat, dtype='float64')
+    finite = mat[isfinite(mat)]
+    if not finite.size:
+        return 0.0, 1.0
+    return float(finite.min()), float(finite.max())
+
+
+def matrix_to_im(mat, colormap=None, vmin=None, vmax=None):
+    """
+    Render a matrix as a colormapped RGBA PNG image, one pixel per cell.
+
+    Values are scaled linearly between vmin and vmax (by default the finite
+    minimum and maximum) to 255 color levels, written as a palette image
+    with one byte per pixel, and non-finite cells are left transparent.
+
+    Parameters
+    ----------
+    mat : array-like, (n,m)
+        Matrix data
+
+    colormap : str, optional, default=None
+        Name of a colorbrewer color map, defaults to 'Purples'
+
+    vmin, vmax : scalar, optional, default=None
+        Values mapped to the ends of the color map
+    """
+    from numpy import isfinite, rint, clip
+    from matplotlib.pyplot import get_cmap
+
+    mat = asarray(mat, dtype='float64')
+    finite = isfinite(mat)
+    if vmin is None or vmax is None:
+        low, high = value_range(mat)
+        vmin = low if vmin is None else vmin
+        vmax = high if vmax is None else vmax
+    span = vmax - vmin if vmax > vmin else 1
+
+    if colormap is None or colormap == 'Lightning':
+        colormap = 'Purples'
+    # the last palette entry is transparent, for non-finite cells
+    table = zeros((256, 4), dtype=uint8)
+    table[:255] = rint(get_cmap(colormap)(linspace(0, 1, 255)) * 255)
+
+    levels = clip(rint((where(finite, mat, vmin) - vmin) / span * 254), 0, 254).astype(uint8)
+    levels[~finite] = 255
+
+    return array_to_png(levels, _png['compression'], palette=table)
+
+
+# default compression for encoded images, see set_png_compression
+_png = {'compression': 6}
+
+
+def set_png_compression(level=6):
+    """
+    Set the zlib compression level (0-9) used when encoding images.
+
+    Lower levels are faster, higher levels produce smaller uploads.
+    """
+    if level not in range(10):
+        raise ValueError("Compression level must be an integer from 0 to 9")
+    _png['compression'] = level
+
+
+# worker settings for encoding image stacks, see set_image_workers
+_image_workers = {'workers': None, 'processes': False, 'pool': None, 'size': None}
+
+
+def set_image_workers(workers=None, processes=False):
+    """
+    Set the number of workers used to encode image stacks (e.g. for gallery and volume).
+
+    Parameters
+    ----------
+    workers : int, optional, default=None
+        Number of workers, defaults to the number of CPUs. Use 1 to encode
+        images serially on the calling thread.
+
+    processes : boolean, optional, default=False
+        Whether to encode in worker processes instead of threads.
+    """
+    pool = _image_workers['pool']
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+    _image_workers.update(workers=workers, processes=processes, pool=None, size=None)
+
+
+def _get_image_pool():
+
+    if _image_workers['pool'] is None:
+        try:
+            from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        except ImportError:
+            # Python 2 without the futures backport, encode serially
+            return None
+        import multiprocessing
+        workers = _image_workers['workers'] or multiprocessing.cpu_count()
+        executor = ProcessPoolExecutor if _image_workers['processes'] else ThreadPoolExecutor
+        _image_workers['pool'] = executor(max_workers=workers)
+        _image_workers['size'] = workers
+
+    return _image_workers['pool']
+
+
+def arrays_to_ims(ims):
+    """
+    Encode a sequence of arrays as images, yielding them in order.
+
+    Encoding runs on a pool of workers (see set_image_workers), a bounded
+    number of images ahead of the consumer, so that later images are
+    encoded while earlier ones are being uploaded. Without
+    concurrent.futures (Python 2 without the futures backport) images
+    are encoded one at a time.
+    """
+    pool = None if _image_workers['workers'] == 1 else _get_image_pool()
+    if pool is None:
+        for im in ims:
+            yield array_to_im(im)
+        return
+
+    from collections import deque
+
+    lookahead = 2 * _image_workers['size']
+    pending = deque()
+    ims = iter(ims)
+    try:
+        for im in ims:
+            pending.append(pool.submit(array_to_im, im, _png['compression']))
+            if len(pending) >= lookahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _to_uint8(im, strip=1024):
+    """
+    Scale an image to uint8 as a whole, in strips of rows.
+
+    Grayscale images are normalized to their minimum and maximum, and
+    color images are clipped to [0, 1] (as with array_to_im).
+    """
+    from numpy import clip
+
+    if im.ndim == 2:
+        low, high = float(im.min()), float(im.max())
+    else:
+        low, high = 0.0, 1.0
+    span = high - low if high > low else 1.0
+
+    out = empty(im.shape, dtype=uint8)
+    for start in range(0, im.shape[0], strip):
+        block = asarray(im[start:start + strip], dtype='float32')
+        out[start:start + strip] = clip((block - low) / span * 255 + 0.5, 0, 255)
+    return out
+
+
+def _halve(im, strip=1024):
+    """
+    Downsample an image by 2 in each dimension by averaging 2x2 blocks,
+    in strips of rows, repeating the last row and column of odd sizes.
+    """
+    h, w = im.shape[:2]
+    out = empty(((h + 1) // 2, (w + 1) // 2) + im.shape[2:], dtype=im.dtype)
+
+    for start in range(0, h, 2 * strip):
+        block = asarray(im[start:start + 2 * strip], dtype='float32')
+        if block.shape[0] % 2:
+            block = concatenate([block, block[-1:]], axis=0)
+        if w % 2:
+            block = concatenate([block, block[:, -1:]], axis=1)
+        mean = (block[0::2, 0::2] + block[1::2, 0::2] + block[0::2, 1::2] + block[1::2, 1::2]) / 4
+        out[start // 2:start // 2 + mean.shape[0]] = mean + 0.5
+    return out
+
+
+def tile_pyramid(im, tilesize=512):
+    """
+    Cut an image into fixed-size tiles at successive 2x downsampled levels.
+
+    Levels are halved until they fit in a single tile. Returns a dictionary
+    describing the pyramid, and a generator of the PNG encoded tiles, coarsest
+    level first and in row-major order within each level. Images that are
+    not uint8 or uint16 are scaled to uint8 as a whole before tiling, so that
+    all tiles share the same intensity scale.
+
+    Parameters
+    ----------
+    im : array-like, (h,w) or (h,w,c)
+        Image data
+
+    tilesize : int, optional, default=512
+        Width and height of each tile, in pixels
+    """
+    im = asarray(im)
+    if im.ndim not in (2, 3):
         raise Exception("Images must be 2 or 3 dimensions")
+    if im.dtype not in (uint8, uint16):
+        im = _to_uint8(im)
 
-    return imfile.getvalue()
+    levels = [im]
+    while max(levels[-1].shape[:2]) > tilesize:
+        levels.append(_halve(levels[-1]))
+    levels.reverse()
+
+    meta = {'tileSize': tilesize, 'height': im.shape[0], 'width': im.shape[1], 'levels': []}
+    for i, level in enumerate(levels):
+        h, w = level.shape[:2]
+        meta['levels'].append({'level': i, 'scale': 2 ** (len(levels) - 1 - i),
+                               'height': h, 'width': w,
+                               'rows': -(-h // tilesize), 'columns': -(-w // tilesize)})
+
+    def tiles():
+        for level in levels:
+            for r in range(0, level.shape[0], tilesize):
+                for c in range(0, level.shape[1], tilesize):
+                    yield level[r:r + tilesize, c:c + tilesize]
+
+    return meta, arrays_to_ims(tiles())
+
+
+def pack_images(ims, compression=None):
+    """
+    Pack a stack of images into a single binary blob.
+
+    Returns a dictionary with the raw C-ordered little-endian data and the
+    header needed to unpack it: shape, dtype, and compression.
+
+    Parameters
+    ----------
+    ims : array-like, or list of array-like
+        Stack of images, all with the same dimensions
+
+    compression : str, optional, default=None
+        Compress the data, either None or 'zlib'
+    """
+    try:
+        stack = asarray(ims)
+    except ValueError:
+        stack = None
+
+    if stack is None or stack.dtype.kind not in 'biuf':
+        raise ValueError("Packed images must be numeric arrays with the same dimensions")
+
+    if stack.dtype.byteorder == '>':
+        stack = stack.astype(stack.dtype.newbyteorder('<'))
+
+    data = ascontiguousarray(stack).tobytes()
+
+    if compression == 'zlib':
+        import zlib
+        data = zlib.compress(data, _png['compression'])
+    elif compression is not None:
+        raise ValueError("Compression must be one of None, 'zlib'")
+
+    return {'data': data, 'shape': list(stack.shape), 'dtype': stack.dtype.str, 'compression': compression}
 
 
 def list_to_regions(reg):
@@ -292,19 +1094,68 @@ def list_to_regions(reg):
         return reg
 
 
+def polygon_to_region(coords, dims=None):
+    """
+    Rasterize a polygon over its bounding box with a vectorized scanline fill.
+
+    Pixel (r, c) is inside if its center lies inside the polygon under the
+    even-odd rule, with edges that cross a row counted half-open so vertices
+    are not counted twice. Returns a boolean mask over the bounding box,
+    clipped to dims if given, and the row and column of its top left corner.
+
+    Parameters
+    ----------
+    coords : array-like, (n,2)
+        Polygon vertices as x/y pairs
+
+    dims : array-like, optional, default=None
+        Dimensions of the image containing the polygon
+    """
+    from numpy import roll, clip, add
+
+    verts = asarray(coords).astype('int')
+    x = verts[:, 0].astype('float64')
+    y = verts[:, 1].astype('float64')
+    xnext = roll(x, -1)
+    ynext = roll(y, -1)
+
+    rmin, rmax = int(y.min()), int(y.max())
+    cmin, cmax = int(x.min()), int(x.max())
+    if dims is not None:
+        rmin, rmax = max(rmin, 0), min(rmax, dims[0] - 1)
+        cmin, cmax = max(cmin, 0), min(cmax, dims[1] - 1)
+    if rmax < rmin or cmax < cmin:
+        return zeros((0, 0), dtype=bool), (rmin, cmin)
+
+    h, w = rmax - rmin + 1, cmax - cmin + 1
+    toggles = zeros((h, w + 1), dtype=uint8)
+
+    # rows in blocks, bounding the (rows, edges) crossing table
+    block = max(1, 4000000 // len(x))
+    for start in range(0, h, block):
+        rows = arange(rmin + start, rmin + min(start + block, h))[:, newaxis]
+        crosses = ((y <= rows) & (rows < ynext)) | ((ynext <= rows) & (rows < y))
+        r, e = nonzero(crosses)
+        xint = x[e] + (rows[r, 0] - y[e]) * (xnext[e] - x[e]) / (ynext[e] - y[e])
+        cols = clip(ceil(xint) - cmin, 0, w).astype('int')
+        add.at(toggles, (r + start, cols), 1)
+
+    # parity of the crossings at or left of each pixel, wrapping uint8 keeps parity
+    inside = (cumsum(toggles, axis=1, dtype=uint8)[:, :w] & 1).astype(bool)
+
+    return inside, (rmin, cmin)
+
+
 def polygon_to_mask(coords, dims, z=None):
     """
     Given a list of pairs of points which define a polygon, return a binary
     mask covering the interior of the polygon with dimensions dim
     """
 
-    bounds = array(coords).astype('int')
-    path = Path(bounds)
+    region, (r, c) = polygon_to_region(coords, dims)
 
-    grid = meshgrid(range(dims[1]), range(dims[0]))
-    grid_flat = zip(grid[0].ravel(), grid[1].ravel())
-
-    mask = path.contains_points(grid_flat).reshape(dims[0:2]).astype('int')
+    mask = zeros(dims[0:2], dtype='int')
+    mask[r:r + region.shape[0], c:c + region.shape[1]] = region
 
     if z is not None:
         if len(dims) < 3:
@@ -324,21 +1175,27 @@ def polygon_to_points(coords, z=None):
     return a list of points interior to the polygon
     """
 
-    bounds = array(coords).astype('int')
+    region, (r, c) = polygon_to_region(coords)
 
-    bmax = bounds.max(0)
-    bmin = bounds.min(0)
+    points = where(region)
+    points = (vstack([points[0], points[1]]).T + [r, c]).tolist()
+    if z is not None:
+        points = [[p[0], p[1], z] for p in points]
 
-    path = Path(bounds)
+    return points
 
-    grid = meshgrid(range(bmin[0], bmax[0]+1), range(bmin[1], bmax[1]+1))
 
-    grid_flat = zip(grid[0].ravel(), grid[1].ravel())
+def polygons_to_labels(polygons, dims):
+    """
+    Write polygons into a single integer label image, in one pass.
 
-    points = path.contains_points(grid_flat).reshape(grid[0].shape).astype('int')
-    points = where(points)
-    points = (vstack([points[0], points[1]]).T + bmin[-1::-1]).tolist()
-    if z is not None:
-        points = map(lambda p: [p[0], p[1], z], points)
+    Pixels inside the i-th polygon are labeled i + 1, with later polygons
+    overwriting earlier ones where they overlap, and 0 elsewhere.
+    """
+    labels = zeros(dims[0:2], dtype='int32')
+    for i, coords in enumerate(polygons):
+        region, (r, c) = polygon_to_region(coords, dims)
+        view = labels[r:r + region.shape[0], c:c + region.shape[1]]
+        view[region] = i + 1
 
-    return points
\ No newline at end of file
+    return labels
@@ -1,22 +1,22 @@
-import requests
 import json
-import webbrowser
 import random
 import string
+import threading
 
 class Visualization(object):
 
+    # background event listener used outside IPython, see on
+    _listener = None
+
+    # notebook comm opened for this visualization alone, see Lightning._subscribe
+    comm = None
+
     def __init__(self, session=None, json=None, auth=None):
 
         self.session = session
         self.id = json.get('id')
         self.auth = auth
-
-        if self.session.lgn.ipython_enabled:
-            from ipykernel.comm import Comm
-            self.comm = Comm('lightning', {'id': self.id})
-            self.comm_handlers = {}
-            self.comm.on_msg(self._handle_comm_message)
+        self.comm_handlers = {}
 
     def _format_url(self, url):
         if not url.endswith('/'):
@@ -31,13 +31,20 @@ class Visualization(object):
         url = self.session.host + '/sessions/' + str(self.session.id) + '/visualizations/' + str(self.id) + '/data/images'
         url = self._format_url(url)
         files = {'file': image}
-        return requests.put(url, files=files, data={'type': 'image'}, auth=self.auth)
+        return self.session.transport.put(url, files=files, data={'type': 'image'}, auth=self.auth)
 
     def _append_image(self, image):
         url = self.session.host + '/sessions/' + str(self.session.id) + '/visualizations/' + str(self.id) + '/data/images'
         url = self._format_url(url)
         files = {'file': image}
-        return requests.post(url, files=files, data={'type': 'image'}, auth=self.auth)
+        return self.session.transport.post(url, files=files, data={'type': 'image'}, auth=self.auth)
+
+    def _send_packed(self, packed, method='POST'):
+        url = self.session.host + '/sessions/' + str(self.session.id) + '/visualizations/' + str(self.id) + '/data/images'
+        url = self._format_url(url)
+        files = {'file': ('packed', packed['data'], 'application/octet-stream')}
+        payload = {'type': 'packed', 'packed': json.dumps(packed_header(packed))}
+        return self.session.transport.request(method, url, files=files, data=payload, auth=self.auth)
 
     def _append_data(self, data=None, field=None):
         payload = {'data': data}
@@ -47,7 +54,7 @@ class Visualization(object):
             url += field
 
         url = self._format_url(url)
-        return requests.post(url, data=json.dumps(payload), headers=headers, auth=self.auth)
+        return self.session.transport.post(url, data=json_body(payload), headers=headers, auth=self.auth)
 
     def _update_data(self, data=None, field=None):
         payload = {'data': data}
@@ -57,7 +64,14 @@ class Visualization(object):
             url += field
 
         url = self._format_url(url)
-        return requests.put(url, data=json.dumps(payload), headers=headers, auth=self.auth)
+        return self.session.transport.put(url, data=json_body(payload), headers=headers, auth=self.auth)
+
+    def _patch_data(self, data=None):
+        payload = {'data': data}
+        headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
+        url = self.session.host + '/sessions/' + str(self.session.id) + '/visualizations/' + str(self.id) + '/data/'
+        url = self._format_url(url)
+        return self.session.transport.patch(url, data=json_body(payload), headers=headers, auth=self.auth)
 
     def get_permalink(self):
         return self.session.host + '/visualizations/' + str(self.id)
@@ -69,45 +83,105 @@ class Visualization(object):
         return self._format_url(self.get_permalink() + '/embed')
 
     def get_html(self):
-        r = requests.get(self.get_embed_link(), auth=self.auth)
+        r = self.session.transport.get(self.get_embed_link(), auth=self.auth)
         return r.text
 
     def open(self):
+        import webbrowser
         webbrowser.open(self.get_public_link())
 
     def delete(self):
         url = self.get_permalink()
-        return requests.delete(url)
+        return self.session.transport.delete(url)
 
-    def on(self, event_name, handler):
+    def on(self, event_name, handler, throttle=None, debounce=None):
+        """
+        Call handler with the event data whenever event_name occurs.
+
+        In IPython, events arrive over a comm opened on the first call,
+        shared by all visualizations of the Lightning instance when
+        multiplexing is enabled (see Lightning.enable_ipython). Elsewhere, a
+        background listener subscribes to the visualization's settings
+        (see EventListener) and handlers are called on a worker thread.
+
+        Parameters
+        ----------
+        event_name : str
+            Name of the event, e.g. 'selected'
+
+        handler : function
+            Called with the event data
+
+        throttle : float, optional, default=None
+            Call handler at most once per this many seconds, with the latest data
+
+        debounce : float, optional, default=None
+            Call handler only once events have paused for this many seconds,
+            with the latest data
+        """
+        if throttle is not None or debounce is not None:
+            from lightning.events import RateLimited
+            handler = RateLimited(handler, throttle=throttle, debounce=debounce)
 
         if self.session.lgn.ipython_enabled:
             self.comm_handlers[event_name] = handler
+            self.session.lgn._subscribe(self)
 
         else:
-            raise Exception('The current implementation of this method is only compatible with IPython.')
+            if self._listener is None:
+                from lightning.events import EventListener
+                self._listener = EventListener(self)
+            self._listener.on(event_name, handler)
 
-    def _handle_comm_message(self, message):
-        # Parsing logic taken from similar code in matplotlib
-        message = json.loads(message['content']['data'])
+    def stop_events(self, timeout=None):
+        """
+        Stop the background event listener started by on, outside IPython.
+        """
+        if self._listener is not None:
+            self._listener.stop(timeout)
+            self._listener = None
 
+    def _handle_comm_message(self, message):
         if message['type'] in self.comm_handlers:
             self.comm_handlers[message['type']](message['data'])
 
     @classmethod
-    def _create(cls, session=None, data=None, images=None, type=None, options=None, description=None):
+    def _create(cls, session=None, data=None, images=None, packed=None, type=None, options=None, description=None):
+
+        import requests
 
         if options is None:
             options = {}
 
         url = session.host + '/sessions/' + str(session.id) + '/visualizations'
 
-        if not images:
+        # images may be a generator still encoding later images
+        first_image = None
+        if images is not None:
+            images = iter(images)
+            first_image = next(images, None)
+
+        if packed is not None:
+            # the whole image stack as one binary part, with its header as a field
+            files = {'file': ('packed', packed['data'], 'application/octet-stream')}
+            payload = {'type': type, 'options': json.dumps(options),
+                       'packed': json.dumps(packed_header(packed))}
+            if description:
+                payload['description'] = description
+            r = session.transport.post(url, files=files, data=payload, auth=session.auth)
+            if r.status_code == 404:
+                raise Exception(r.text)
+            elif not r.status_code == requests.codes.ok:
+                raise Exception('Problem uploading images')
+
+            viz = cls(session=session, json=r.json(), auth=session.auth)
+
+        elif first_image is None:
             payload = {'data': data, 'type': type, 'options': options}
             if description:
                 payload['description'] = description
             headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-            r = requests.post(url, data=json.dumps(payload), headers=headers, auth=session.auth)
+            r = session.transport.post(url, data=json_body(payload), headers=headers, auth=session.auth)
             if r.status_code == 404:
                 raise Exception(r.text)
             elif not r.status_code == requests.codes.ok:
@@ -116,49 +190,116 @@ class Visualization(object):
             viz = cls(session=session, json=r.json(), auth=session.auth)
 
         else:
-            first_image, remaining_images = images[0], images[1:]
             files = {'file': first_image}
             payload = {'type': type, 'options': json.dumps(options)}
             if description:
                 payload['description'] = description
-            r = requests.post(url, files=files, data=payload, auth=session.auth)
+            r = session.transport.post(url, files=files, data=payload, auth=session.auth)
             if r.status_code == 404:
                 raise Exception(r.text)
             elif not r.status_code == requests.codes.ok:
                 raise Exception('Problem uploading images')
 
             viz = cls(session=session, json=r.json(), auth=session.auth)
-            for image in remaining_images:
+            for image in images:
                 viz._append_image(image)
 
         return viz
 
+def packed_header(packed):
+    """
+    Metadata describing a packed binary upload (everything but the data itself).
+    """
+    return dict((key, value) for (key, value) in packed.items() if key != 'data')
+
+
+def _is_streamed(obj):
+    if hasattr(obj, 'iterjson'):
+        return True
+    if isinstance(obj, dict):
+        return any(_is_streamed(value) for value in obj.values())
+    return False
+
+
+def iter_json(obj):
+    """
+    Serialize to JSON text in pieces.
+
+    Values with an iterjson method (e.g. EdgeList) produce their own pieces,
+    so they are never serialized all at once.
+    """
+    if hasattr(obj, 'iterjson'):
+        for piece in obj.iterjson():
+            yield piece
+    elif isinstance(obj, dict) and _is_streamed(obj):
+        yield '{'
+        for i, (key, value) in enumerate(obj.items()):
+            yield (', ' if i else '') + json.dumps(key) + ': '
+            for piece in iter_json(value):
+                yield piece
+        yield '}'
+    else:
+        yield json.dumps(obj)
+
+
+def json_body(payload, buffersize=65536):
+    """
+    Request body for a JSON payload.
+
+    Payloads with streamed values are returned as a generator of byte
+    chunks of about buffersize, sent with chunked transfer encoding, so
+    the whole body is never held in memory.
+    """
+    if not _is_streamed(payload):
+        return json.dumps(payload)
+
+    def chunks():
+        buf = []
+        buffered = 0
+        for piece in iter_json(payload):
+            buf.append(piece)
+            buffered += len(piece)
+            if buffered >= buffersize:
+                yield ''.join(buf).encode('utf-8')
+                buf = []
+                buffered = 0
+        if buf:
+            yield ''.join(buf).encode('utf-8')
+
+    return chunks()
+
+
 class VisualizationLocal(object):
 
     def __init__(self, html):
         self._html = html
+        self._spec = None
 
     @classmethod
     def _create(cls, data=None, images=None, type=None, options=None):
 
         import base64
-        from jinja2 import Template, escape
+        from jinja2 import escape
+
+        t = cls._get_template()
 
-        t = Template(cls.load_template())
+        spec = {'type': type, 'options': json.dumps(options), 'data': None, 'images': None}
 
-        options = escape(json.dumps(options))
+        options = escape(spec['options'])
         random_id = 'A' + ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(9))
         fields = {'viz': type, 'options': options, 'viz_id': random_id}
 
         if images:
-            bytes = ['data:image/png;base64,' + base64.b64encode(img) + ',' for img in images]
-            fields['images'] = escape(json.dumps(bytes))
-        else:
-            data = escape(json.dumps(data))
-            fields['data'] = data
+            bytes = ['data:image/png;base64,' + base64.b64encode(img).decode('ascii') + ',' for img in images]
+            spec['images'] = json.dumps(bytes)
+            fields['images'] = escape(spec['images'])
+        if data is not None or not images:
+            spec['data'] = ''.join(iter_json(data))
+            fields['data'] = escape(spec['data'])
 
         html = t.render(**fields)
         viz = cls(html)
+        viz._spec = spec
         return viz
 
     def get_html(self):
@@ -185,7 +326,7 @@ class VisualizationLocal(object):
 
         import os
         base = self._html
-        js = self.load_embed()
+        js = self._load_embed_bytes()
         if os.path.exists(filename):
             if overwrite is False:
                 raise ValueError("File '%s' exists. To ovewrite call save_html with overwrite=True."
@@ -194,19 +335,156 @@ class VisualizationLocal(object):
                 os.remove(filename)
         with open(filename, "wb") as f:
             f.write(base.encode('utf-8'))
-            f.write('<script>' + js.encode('utf-8') + '</script>')
+            f.write(b'<script>' + js + b'</script>')
 
     @staticmethod
     def load_template():
-        import os
-        location = os.path.join(os.path.dirname(__file__), 'lib/template.html')
-        return open(location).read()
+        return _load_lib('template.html', _read_text)
 
     @staticmethod
-    def load_embed():
-        import os
-        location = os.path.join(os.path.dirname(__file__), 'lib/embed.js')
-        import codecs
-        return codecs.open(location, "r", "utf-8").read()
+    def load_embed(compressed=False):
+        """
+        Load the Javascript used to render local visualizations.
 
+        The file is read once per process and cached until it changes on disk.
+        The bundle is already minified, if compressed is True return it as
+        gzip compressed bytes instead (e.g. for serving with Content-Encoding: gzip).
+        """
+        if compressed:
+            return _load_lib('embed.js', _read_gzip)
+        return _load_lib('embed.js', _read_text)
 
+    @staticmethod
+    def _load_embed_bytes():
+        return _load_lib('embed.js', _read_bytes)
+
+    @staticmethod
+    def _get_template():
+        return _load_lib('template.html', _compile_template)
+
+
+def save_dashboard(visualizations, filename=None, overwrite=False, title='Lightning', script=None):
+    """
+    Save many local visualizations to a single html page.
+
+    The Javascript for rendering is included once for the whole page, and
+    each visualization only gets its data attached and rendered when it
+    is scrolled into view.
+
+    Parameters
+    ----------
+    visualizations : list
+        Local visualizations to include, in order
+
+    filename : str
+        The filename to save to
+
+    overwrite : boolean, optional, default=False
+        Whether to overwrite an existing file
+
+    title : str, optional, default='Lightning'
+        Title of the page
+
+    script : str, optional, default=None
+        If None, the Javascript is embedded in the page. Otherwise, a filename
+        relative to the page (e.g. 'lightning.js') where the Javascript will be
+        written (with a gzip compressed copy alongside) and loaded from, so that
+        many pages saved to the same directory share one script.
+    """
+    import os
+
+    if filename is None:
+        raise ValueError('Please provide a filename, e.g. save_dashboard(vizs, filename="dashboard.html").')
+
+    if os.path.exists(filename) and overwrite is False:
+        raise ValueError("File '%s' exists. To ovewrite call save_dashboard with overwrite=True."
+                         % os.path.abspath(filename))
+
+    items = []
+    for i, viz in enumerate(visualizations):
+        spec = getattr(viz, '_spec', None)
+        if spec is None:
+            raise ValueError('Only local visualizations can be saved to a dashboard, '
+                             'create them after calling lgn.enable_local()')
+        data = spec['data'] if spec['data'] is not None else 'null'
+        images = spec['images'] if spec['images'] is not None else 'null'
+        payload = '{"data": %s, "images": %s}' % (data, images)
+        items.append({
+            'id': 'lightning-viz-%d' % i,
+            'type': spec['type'],
+            'options': spec['options'],
+            # keep the data from closing its script block
+            'payload': payload.replace('</', '<\\/')
+        })
+
+    if script is None:
+        js = VisualizationLocal._load_embed_bytes()
+        embed = '<script>' + js.decode('utf-8') + '</script>'
+    else:
+        from jinja2 import escape
+        location = os.path.join(os.path.dirname(os.path.abspath(filename)), script)
+        _write_if_changed(location, VisualizationLocal._load_embed_bytes())
+        _write_if_changed(location + '.gz', VisualizationLocal.load_embed(compressed=True))
+        embed = '<script src="%s"></script>' % escape(script)
+
+    t = _load_lib('dashboard.html', _compile_template)
+    html = t.render(title=title, visualizations=items, embed=embed)
+
+    with open(filename, "wb") as f:
+        f.write(html.encode('utf-8'))
+
+
+def _write_if_changed(location, content):
+    import os
+    if os.path.exists(location) and os.path.getsize(location) == len(content):
+        with open(location, "rb") as f:
+            if f.read() == content:
+                return
+    with open(location, "wb") as f:
+        f.write(content)
+
+
+# process-wide cache of files in lib/, keyed by file and loader,
+# invalidated when the modification time of the file changes
+_lib_cache = {}
+_lib_cache_lock = threading.Lock()
+
+
+def _load_lib(name, loader):
+    import os
+    location = os.path.join(os.path.dirname(__file__), 'lib', name)
+    mtime = os.path.getmtime(location)
+    key = (name, loader.__name__)
+    with _lib_cache_lock:
+        cached = _lib_cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    value = loader(location)
+    with _lib_cache_lock:
+        _lib_cache[key] = (mtime, value)
+    return value
+
+
+def _read_text(location):
+    import codecs
+    with codecs.open(location, "r", "utf-8") as f:
+        return f.read()
+
+
+def _read_bytes(location):
+    with open(location, "rb") as f:
+        return f.read()
+
+
+def _read_gzip(location):
+    import gzip
+    import io
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as f:
+        f.write(_read_bytes(location))
+    return buf.getvalue()
+
+
+def _compile_template(location):
+    from jinja2 import Template
+    return Template(_read_text(location))
@@ -22,7 +22,7 @@ METADATA = dict(
 SETUPTOOLS_METADATA = dict(
     install_requires=open('requirements.txt').read().split(),
     include_package_data=True,
-    package_data={'lightning.lib': ['template.html', 'embed.js', 'icon.png']}
+    package_data={'lightning.lib': ['template.html', 'dashboard.html', 'embed.js', 'icon.png']}
 )
 
 def read(filename):
@@ -1,5 +1,15 @@
+import json
+import re
+import socket
+import threading
+
 import pytest
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
 
 def pytest_addoption(parser):
     parser.addoption("--host", action="store", default="http://localhost:3000",
@@ -9,3 +19,90 @@ def pytest_addoption(parser):
 @pytest.fixture(scope="session")
 def host(request):
     return request.config.getoption("--host")
+
+
+class StandInServer(object):
+    """
+    In-process stand-in for a lightning server that records every request.
+
+    Sessions and visualizations are given increasing ids, settings are
+    served with an ETag (answering 304 when it matches), and any other
+    request gets an empty 200. Set status[method] to answer every request
+    with that method with a different status instead. Nothing listens on
+    the port until start is called.
+    """
+
+    def __init__(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        self.port = sock.getsockname()[1]
+        sock.close()
+
+        self.url = 'http://127.0.0.1:%d' % self.port
+        self.requests = []
+        self.status = {}
+        self.settings = {}
+        self.etag = '"1"'
+        self._server = None
+
+    def calls(self):
+        return [(r['method'], r['path']) for r in self.requests]
+
+    def start(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def _reply(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                path = self.path.split('?')[0]
+                standin.requests.append({'method': self.command, 'path': path,
+                                         'headers': dict(self.headers.items()), 'body': body})
+                code, headers, content = standin._respond(self.command, path, self.headers)
+                self.send_response(code)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _reply
+
+            def log_message(self, *args):
+                pass
+
+        HTTPServer.allow_reuse_address = True
+        self._server = HTTPServer(('127.0.0.1', self.port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _respond(self, method, path, headers):
+        json_headers = {'Content-Type': 'application/json'}
+        if method in self.status:
+            return self.status[method], json_headers, b'{}'
+        if method == 'POST' and re.match(r'^/sessions/?$|^/sessions/[^/]+/visualizations/?$', path):
+            content = {'id': len(self.requests)}
+        elif method == 'GET' and path.endswith('/settings/'):
+            if headers.get('If-None-Match') == self.etag:
+                return 304, {'ETag': self.etag}, b''
+            json_headers['ETag'] = self.etag
+            content = {'settings': self.settings}
+        else:
+            content = {}
+        return 200, json_headers, json.dumps(content).encode('utf-8')
+
+
+@pytest.fixture
+def standin():
+    server = StandInServer()
+    yield server
+    server.stop()
@@ -0,0 +1,63 @@
+import pytest
+from numpy import random
+
+aiohttp = pytest.importorskip("aiohttp")
+asyncio = pytest.importorskip("asyncio")
+
+from lightning.aio import AsyncLightning, AsyncVisualization
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestLightningAsync(object):
+
+    def test_create_concurrent(self, host):
+
+        async def main():
+            async with AsyncLightning(host) as lgn:
+                await lgn.create_session("test-async")
+                return await asyncio.gather(*[lgn.scatter(random.randn(10), random.randn(10))
+                                              for _ in range(5)])
+
+        vizs = run(main())
+
+        assert len(vizs) == 5
+        assert all(isinstance(viz, AsyncVisualization) for viz in vizs)
+        assert all(hasattr(viz, 'id') for viz in vizs)
+
+    def test_append(self, host):
+
+        async def main():
+            async with AsyncLightning(host) as lgn:
+                viz = await lgn.linestreaming(random.randn(5, 10))
+                await asyncio.gather(*[viz.append(random.randn(5, 1)) for _ in range(5)])
+                return viz
+
+        viz = run(main())
+
+        assert isinstance(viz, AsyncVisualization)
+
+    def test_empty_gallery_and_raster_update(self, standin):
+
+        async def main():
+            async with AsyncLightning(standin.start().url) as lgn:
+                empty = await lgn.gallery([])
+                mat = random.randn(20, 30)
+                viz = await lgn.matrix(mat, row_labels=list(range(20)), raster=True)
+                del standin.requests[:]
+                await viz.update(mat * 2, row_labels=list(range(20)), raster=True)
+                return empty
+
+        empty = run(main())
+
+        assert isinstance(empty, AsyncVisualization)
+        assert [method for (method, _) in standin.calls()] == ['PUT', 'PUT']
+        assert standin.requests[0]['path'].endswith('/data/')
+        assert b'rowLabels' in standin.requests[0]['body']
+        assert standin.requests[1]['path'].endswith('/data/images/')
@@ -1,6 +1,12 @@
+import gc
+import json
+import threading
+import time
 import pytest
 from numpy import random
-from lightning import Lightning, Visualization, VisualizationLocal
+from lightning import Lightning, Transport, Visualization, VisualizationLocal, save_dashboard
+from lightning.events import EventListener, RateLimited
+from lightning.spool import SpoolTransport
 
 
 class TestLightningAPIClient(object):
@@ -27,3 +33,303 @@ class TestLightningAPIClient(object):
 
         assert isinstance(viz, VisualizationLocal)
 
+    def test_transport_reuse(self, lgn):
+
+        lgn.disable_local()
+        for _ in range(3):
+            lgn.line(random.randn(10))
+
+        stats = lgn.transport.stats()
+        assert stats['requests'] >= 3
+        assert stats['reused'] > 0
+
+    def test_set_transport(self, lgn):
+
+        lgn.disable_local()
+        viz = lgn.line(random.randn(10))
+        transport = Transport()
+        lgn.set_transport(transport)
+
+        assert lgn.session.transport is transport
+        viz.append(random.randn(10))
+        assert transport.stats()['requests'] == 1
+
+    def test_submit(self, lgn):
+
+        lgn.disable_local()
+        before = len(lgn.session.visualizations)
+        futures = [lgn.submit('scatter', random.randn(10), random.randn(10), size=5) for _ in range(8)]
+        last = futures[-1].result()
+        assert last in lgn.session.visualizations
+        vizs = [future.result() for future in futures]
+
+        assert all(isinstance(viz, Visualization) for viz in vizs)
+        assert lgn.session.visualizations[before:] == vizs
+
+    def test_map_plots(self, lgn):
+
+        lgn.disable_local()
+        series = [random.randn(10) for _ in range(5)]
+        vizs = lgn.map_plots('line', series, thickness=2)
+
+        assert len(vizs) == 5
+        assert all(isinstance(viz, Visualization) for viz in vizs)
+
+    def test_submit_custom_plot(self, lgn):
+
+        lgn.disable_local()
+        future = lgn.submit('plot', data={'series': random.randn(5, 10).tolist()}, type='line')
+
+        assert isinstance(future.result(), Visualization)
+
+    def test_local_save_html(self, lgn, tmpdir):
+
+        lgn.enable_local()
+        viz = lgn.line(random.randn(100))
+        filename = str(tmpdir.join('viz.html'))
+        viz.save_html(filename)
+
+        assert VisualizationLocal.load_embed() is VisualizationLocal.load_embed()
+        with open(filename, 'rb') as f:
+            assert f.read().endswith(b'</script>')
+
+    def test_local_save_dashboard(self, lgn, tmpdir):
+
+        lgn.enable_local()
+        vizs = [lgn.line(random.randn(100)), lgn.scatter(random.randn(10), random.randn(10))]
+        save_dashboard(vizs, str(tmpdir.join('one.html')))
+        save_dashboard(vizs, str(tmpdir.join('two.html')), script='lightning.js')
+
+        with open(str(tmpdir.join('one.html')), 'rb') as f:
+            inline = f.read()
+        with open(str(tmpdir.join('two.html')), 'rb') as f:
+            shared = f.read()
+
+        assert inline.count(b'data-lazy="true"') == 2
+        assert b'<script src="lightning.js"></script>' in shared
+        assert tmpdir.join('lightning.js').size() == len(VisualizationLocal._load_embed_bytes())
+        assert len(shared) < len(inline)
+
+    def test_events(self, lgn):
+
+        lgn.disable_local()
+        viz = lgn.scatter(random.randn(10), random.randn(10))
+        received = threading.Event()
+        selections = []
+
+        def handler(data):
+            selections.append(data)
+            received.set()
+
+        viz.on('selected', handler)
+        try:
+            listener = viz._listener
+            assert listener is not None
+
+            # a change in the settings is delivered on the handler thread
+            listener._update({'settings': {}}, None)
+            listener._update({'settings': {'selected': [1, 2]}}, None)
+            assert received.wait(5)
+            assert selections == [[1, 2]]
+            assert listener.last_error is None
+        finally:
+            viz.stop_events(timeout=5)
+
+        assert viz._listener is None
+
+    def test_events_poll_backoff(self, standin):
+
+        lgn = Lightning(standin.start().url, quiet=True)
+        lgn.create_session()
+        viz = lgn.scatter(random.randn(10), random.randn(10))
+        listener = EventListener(viz, interval=0.05, max_interval=0.4)
+        listener.on('selected', lambda data: None)
+        time.sleep(1.5)
+        listener.stop(timeout=5)
+
+        polls = [r for r in standin.requests if r['path'].endswith('/settings/')]
+        assert listener.mode == 'poll'
+        assert len(polls) < 10
+        assert listener._delay == 0.4
+
+    def test_comm_routing(self, lgn):
+
+        lgn.disable_local()
+        first = lgn.scatter(random.randn(10), random.randn(10))
+        second = lgn.scatter(random.randn(10), random.randn(10))
+        received = []
+        first.comm_handlers['selected'] = lambda data: received.append(('first', data))
+        second.comm_handlers['selected'] = lambda data: received.append(('second', data))
+        lgn._comm_visualizations.update({first.id: first, second.id: second})
+
+        try:
+            for viz, data in [(second, [1]), (first, [2])]:
+                message = {'id': viz.id, 'type': 'selected', 'data': data}
+                lgn._handle_comm_message({'content': {'data': json.dumps(message)}})
+        finally:
+            lgn._comm_visualizations.clear()
+
+        assert received == [('second', [1]), ('first', [2])]
+
+        # comms opened for a single visualization send messages without an id
+        lgn._comm_visualizations.update({first.id: first, second.id: second})
+        try:
+            message = {'type': 'selected', 'data': [3]}
+            lgn._handle_comm_message({'content': {'data': json.dumps(message)}}, viz_id=second.id)
+        finally:
+            lgn._comm_visualizations.clear()
+
+        assert received[-1] == ('second', [3])
+
+    def test_throttle_events(self):
+
+        calls = []
+        handler = RateLimited(calls.append, throttle=60)
+        for i in range(5):
+            handler(i)
+        assert calls == [0]
+        handler._timer.cancel()
+
+        done = threading.Event()
+        handler = RateLimited(lambda data: (calls.append(data), done.set()), debounce=0.05)
+        for i in range(5):
+            handler(i)
+        assert done.wait(5)
+        assert calls == [0, 4]
+
+        with pytest.raises(ValueError):
+            RateLimited(calls.append, throttle=1, debounce=1)
+
+    def test_session_registry(self, lgn):
+
+        lgn.disable_local()
+        session = lgn.create_session("test-registry")
+        kept = [lgn.line(random.randn(10)) for _ in range(3)]
+        lgn.line(random.randn(10))
+        gc.collect()
+
+        assert session.visualizations[:] == kept
+        stats = session.visualizations.stats()
+        assert stats['count'] == 3
+        assert stats['added'] == 4
+        assert stats['collected'] == 1
+
+        session.set_registry(maxsize=2, weak=False)
+        assert session.visualizations[:] == kept[1:]
+        lgn.line(random.randn(10))
+        assert len(session.visualizations) == 2
+        assert session.visualizations.stats()['evicted'] == 2
+
+        assert session.delete_visualizations(kept[1:2]) == 1
+        assert kept[1] not in session.visualizations
+
+        # notebook routes do not keep visualizations alive
+        routed = lgn.line(random.randn(10))
+        lgn._comm_visualizations[routed.id] = routed
+        session.visualizations.remove(routed)
+        del routed
+        gc.collect()
+        assert len(lgn._comm_visualizations) == 0
+
+        class Comm(object):
+            sent = []
+
+            def send(self, message):
+                self.sent.append(message)
+
+        viz = session.visualizations[-1]
+        lgn._comm = Comm()
+        lgn._comm_visualizations[viz.id] = viz
+        try:
+            session.close()
+        finally:
+            lgn._comm = None
+        assert len(session.visualizations) == 0
+        assert Comm.sent == [{'unsubscribe': viz.id}]
+
+    def test_spool_replay(self, standin, tmpdir):
+
+        path = str(tmpdir.join('lightning.spool'))
+        transport = SpoolTransport(path, retry=0.05, max_retry=0.2)
+        lgn = Lightning(standin.url, transport=transport, quiet=True)
+        lgn.create_session('test-spool')
+        viz = lgn.line(random.randn(10))
+        viz.append(random.randn(10))
+        viz.update(random.randn(10))
+
+        assert transport.stats()['spooled'] == 4
+        assert transport.resolve(viz.id) is None
+        assert not transport.flush(0.2)
+        assert transport.stats()['retries'] > 0
+
+        standin.start()
+        try:
+            assert transport.flush(10)
+            assert standin.calls() == [('POST', '/sessions/'),
+                                       ('POST', '/sessions/1/visualizations'),
+                                       ('POST', '/sessions/1/visualizations/2/data/'),
+                                       ('PUT', '/sessions/1/visualizations/2/data/')]
+            assert transport.resolve(viz.id) == 2
+            assert transport.stats()['replayed'] == 4
+            assert transport.pending() == 0
+
+            viz._get_user_data()
+            assert standin.calls()[-1] == ('GET', '/sessions/1/visualizations/2/settings/')
+        finally:
+            transport.close()
+
+    def test_spool_resume(self, standin, tmpdir):
+
+        path = str(tmpdir.join('lightning.spool'))
+        transport = SpoolTransport(path, retry=0.05)
+        lgn = Lightning(standin.start().url, transport=transport, quiet=True)
+        lgn.create_session('test-spool-resume')
+        viz = lgn.line(random.randn(10))
+        assert transport.flush(10)
+        data_path = '/sessions/%s/visualizations/%s/data/' % (transport.resolve(lgn.session.id),
+                                                              transport.resolve(viz.id))
+
+        # spooled while the server is down, then the process stops
+        standin.stop()
+        viz.append(random.randn(10))
+        viz.append(random.randn(10))
+        transport.close()
+        with open(path, 'ab') as f:
+            f.write(b'{"method": "POST", "url": "')
+
+        # the next transport resumes from the saved position with the saved ids
+        standin.start()
+        transport = SpoolTransport(path)
+        try:
+            assert transport.flush(10)
+            assert standin.calls()[-2:] == [('POST', data_path)] * 2
+            assert transport.stats()['replayed'] == 2
+            assert transport.stats()['failed'] == 0
+        finally:
+            transport.close()
+
+    def test_spool_server_errors(self, standin, tmpdir):
+
+        path = str(tmpdir.join('lightning.spool'))
+        transport = SpoolTransport(path, retry=0.01, max_attempts=3)
+        lgn = Lightning(standin.start().url, transport=transport, quiet=True)
+        lgn.create_session('test-spool-errors')
+        viz = lgn.line(random.randn(10)).enable_delta()
+        assert transport.flush(10)
+
+        # a request the server keeps failing is skipped, not retried forever
+        standin.status['POST'] = 500
+        viz.append(random.randn(10))
+        assert transport.flush(10)
+        del standin.status['POST']
+        viz.update(random.randn(10))
+        viz.update(random.randn(10))
+        try:
+            assert transport.flush(10)
+            stats = transport.stats()
+            assert stats['failed'] == 1
+            assert stats['retries'] == 2
+            assert [method for (method, _) in standin.calls()[-5:]] == ['POST'] * 3 + ['PUT'] * 2
+            assert viz._delta is None
+        finally:
+            transport.close()
@@ -1,6 +1,8 @@
 import pytest
-from numpy import random, ceil
+from numpy import random, ceil, zeros, argwhere
 from lightning import Lightning, Visualization
+from lightning.types.utils import array_to_im, arrays_to_ims, set_image_workers, tile_pyramid, \
+    polygon_to_mask, polygon_to_points, polygons_to_labels
 
 
 class TestLightningImages(object):
@@ -27,3 +29,89 @@ class TestLightningImages(object):
 
         assert isinstance(viz, Visualization)
         assert hasattr(viz, 'id')
+
+    def test_create_volume(self, lgn):
+
+        imgs = [random.rand(10, 10) for _ in range(5)]
+        viz = lgn.volume(imgs)
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_create_gallery_empty(self, lgn):
+
+        viz = lgn.gallery([])
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_encode_images_parallel(self):
+
+        imgs = [random.rand(10, 10) for _ in range(6)]
+        serial = [array_to_im(im) for im in imgs]
+
+        set_image_workers(2)
+        try:
+            assert list(arrays_to_ims(imgs)) == serial
+        finally:
+            set_image_workers()
+
+    def test_create_image_uint8(self, lgn):
+
+        img = (random.rand(10, 10, 3) * 255).astype('uint8')
+        viz = lgn.image(img)
+
+        assert isinstance(viz, Visualization)
+        assert array_to_im(img).startswith(b'\x89PNG')
+        assert array_to_im(img, compression=0) != array_to_im(img, compression=9)
+
+    def test_create_volume_packed(self, lgn):
+
+        imgs = [random.rand(10, 10) for _ in range(5)]
+        viz = lgn.volume(imgs, packed=True, compression='zlib')
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_create_image_tiles(self, lgn):
+
+        img = random.rand(300, 200, 3)
+        viz = lgn.image(img, tiles=64)
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_create_imagepoly_tiles(self, lgn):
+
+        img = random.rand(300, 200)
+        viz = lgn.imagepoly(img, polygons=[[0, 0], [0, 150], [250, 150]], tiles=64)
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_tile_pyramid(self):
+
+        pyramid, tiles = tile_pyramid(random.rand(300, 200), tilesize=64)
+        tiles = list(tiles)
+
+        assert [level['scale'] for level in pyramid['levels']] == [8, 4, 2, 1]
+        assert pyramid['levels'][-1]['height'] == 300
+        assert pyramid['levels'][0]['height'] <= 64 and pyramid['levels'][0]['width'] <= 64
+        assert len(tiles) == sum(level['rows'] * level['columns'] for level in pyramid['levels'])
+        assert all(tile.startswith(b'\x89PNG') for tile in tiles)
+
+    def test_polygon_masks(self):
+
+        square = [[2, 1], [2, 4], [6, 4], [6, 1]]
+        mask = polygon_to_mask(square, (8, 8))
+        expected = zeros((8, 8), dtype='int')
+        expected[1:4, 2:6] = 1
+        assert (mask == expected).all()
+
+        points = polygon_to_points(square)
+        assert sorted(points) == sorted(argwhere(expected).tolist())
+
+        triangle = [[0, 0], [7, 0], [0, 7]]
+        labels = polygons_to_labels([square, triangle], (8, 8))
+        assert (labels[polygon_to_mask(triangle, (8, 8)) == 1] == 2).all()
+        assert ((labels == 1) == ((expected == 1) & (polygon_to_mask(triangle, (8, 8)) == 0))).all()
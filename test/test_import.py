@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+# a cold 'import lightning' must take at most this fraction of the time
+# needed to also load the plot types, measured in the same environment
+IMPORT_FRACTION = 0.5
+
+DEFERRED = ['numpy', 'matplotlib', 'requests', 'jinja2', 'IPython', 'ipykernel']
+
+
+def run(code):
+    out = subprocess.check_output([sys.executable, '-c', code])
+    return out.decode('utf-8').strip()
+
+
+class TestLightningImport(object):
+
+    def test_import_defers_dependencies(self):
+
+        out = run("import sys, lightning; "
+                  "print(','.join(m for m in %r if m in sys.modules))" % DEFERRED)
+
+        assert out == ''
+
+    def test_import_budget(self):
+
+        code = "import time; t = time.time(); import lightning; %s; print(time.time() - t)"
+        lazy = min(float(run(code % 'pass')) for _ in range(3))
+        eager = min(float(run(code % 'lightning.Scatter')) for _ in range(3))
+
+        assert lazy < IMPORT_FRACTION * eager
+
+    def test_star_import(self):
+
+        out = run("from lightning import *; print(Lightning.__name__, Scatter.__name__, Volume.__name__)")
+
+        assert out.split() == ['Lightning', 'Scatter', 'Volume']
+
+    def test_plot_types_load_on_use(self):
+
+        out = run("import lightning; print(hasattr(lightning.Lightning, 'scatter')); "
+                  "lightning.Scatter; print(hasattr(lightning.Lightning, 'scatter'))")
+
+        assert out.split() == ['False', 'True']
@@ -1,7 +1,10 @@
+import json
 import pytest
-from numpy import random, ceil, array, clip
-from lightning import Lightning, Visualization
-from lightning.types.utils import mat_to_links
+from numpy import random, ceil, array, clip, allclose, vstack, lexsort, save
+from lightning import Lightning, Visualization, Scatter, Line, Histogram, Matrix
+from lightning.encoding import decode_array, row_fingerprints, changed_ranges
+from lightning.visualization import iter_json
+from lightning.types.utils import mat_to_links, parse_links, parse_nodes, EdgeList
 
 
 class TestLightningPlots(object):
@@ -88,6 +91,45 @@ class TestLightningPlots(object):
         assert isinstance(viz, Visualization)
         assert hasattr(viz, 'id')
 
+    def test_create_matrix_raster(self, lgn):
+
+        mat = random.randn(600, 500)
+        viz = lgn.matrix(mat, colormap='RdBu', row_labels=list(range(600)))
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_update_matrix_raster(self, standin):
+
+        lgn = Lightning(standin.start().url, quiet=True)
+        lgn.create_session()
+        mat = random.randn(20, 30)
+        viz = lgn.matrix(mat, row_labels=list(range(20)), raster=True)
+        del standin.requests[:]
+        viz.update(mat * 2, row_labels=list(range(20)), raster=True)
+
+        assert [method for (method, _) in standin.calls()] == ['PUT', 'PUT']
+        data = json.loads(standin.requests[0]['body'].decode('utf-8'))['data']
+        assert data['shape'] == [20, 30]
+        assert data['rowLabels'] == list(range(20))
+        assert standin.requests[1]['path'].endswith('/data/images/')
+
+    def test_matrix_raster(self):
+
+        mat = random.randn(20, 30)
+        data = Matrix.clean(mat, raster=True)
+        assert data['images'][0][:8] == b'\x89PNG\r\n\x1a\n'
+        assert data['shape'] == [20, 30]
+        assert allclose(data['range'], [mat.min(), mat.max()])
+        assert 'matrix' not in data
+
+        assert 'matrix' in Matrix.clean(mat)
+        assert 'images' in Matrix.clean(mat, raster=100)
+
+        with pytest.raises(Exception) as e:
+            Matrix.clean(mat, colormap='Nope', raster=True)
+        assert 'Invalid cmap' in str(e.value)
+
     def test_create_force(self, lgn):
 
         mat = array([[random.uniform(0, 25) if random.random() > 0.95 else 0 for _ in range(25)] for _ in range(25)])
@@ -124,3 +166,310 @@ class TestLightningPlots(object):
 
         assert isinstance(viz, Visualization)
         assert hasattr(viz, 'id')
+
+    def test_create_scatter_binary(self, lgn):
+
+        x = random.randn(100)
+        y = random.randn(100)
+        s = random.rand(100) * 10 + 10
+
+        lgn.set_encoding('binary')
+        try:
+            viz = lgn.scatter(x, y, size=s)
+        finally:
+            lgn.set_encoding('json')
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_binary_encoding_roundtrip(self):
+
+        x = random.randn(100)
+        y = random.randn(100)
+        data = Scatter._format_data(Scatter.clean(x, y, size=5), encoding='binary')
+
+        assert allclose(decode_array(data['points']), vstack([x, y]).T)
+        assert decode_array(data['size']).tolist() == [5]
+
+    def test_append_background(self, lgn):
+
+        viz = lgn.linestreaming(random.randn(5, 10))
+        sender = viz.enable_background(maxsize=4, overflow='block')
+        for _ in range(20):
+            viz.append(random.randn(5, 2))
+        viz.disable_background()
+
+        stats = sender.stats()
+        assert stats['queued'] == 20
+        assert stats['sent'] == 20
+        assert stats['pending'] == 0
+
+    def test_append_background_failed(self, standin):
+
+        lgn = Lightning(standin.start().url, quiet=True)
+        lgn.create_session()
+        viz = lgn.linestreaming(random.randn(5, 10))
+        sender = viz.enable_background()
+        standin.status['POST'] = 500
+        viz.append(random.randn(5, 2))
+        viz.disable_background()
+
+        stats = sender.stats()
+        assert stats['sent'] == 0
+        assert stats['failed'] == 1
+        assert '500' in str(sender.last_error)
+
+    def test_append_coalesce(self, lgn):
+
+        viz = lgn.scatterstreaming(random.randn(10), random.randn(10))
+        first = viz.clean(random.randn(3), random.randn(3), size=random.rand(3) + 1)
+        second = viz.clean(random.randn(2), random.randn(2), size=random.rand(2) + 1)
+        merged = viz._coalesce(first, second)
+
+        assert merged['points'].shape == (5, 2)
+        assert merged['size'].shape == (5,)
+
+    def test_create_line_max_points(self, lgn):
+
+        series = random.randn(5, 1000)
+        viz = lgn.line(series, max_points=100)
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_downsample_line(self):
+
+        series = random.randn(3, 1000).cumsum(axis=1)
+        for method in ['lttb', 'minmax']:
+            data = Line.clean(series, max_points=100, downsample=method)
+            assert data['series'].shape[0] == 3
+            assert data['series'].shape[1] <= 100
+            assert data['index'].shape == (data['series'].shape[1],)
+            assert (series[:, data['index']] == data['series']).all()
+
+    def test_downsample_line_max_points(self):
+
+        for k in [1, 3]:
+            series = random.randn(k, 1000).cumsum(axis=1)
+            for method in ['lttb', 'minmax']:
+                for max_points in [3, 4, 7, 100]:
+                    data = Line.clean(series, max_points=max_points, downsample=method)
+                    assert data['series'].shape[-1] <= max_points
+                with pytest.raises(ValueError):
+                    Line.clean(series, max_points=2, downsample=method)
+
+    def test_create_scatter_max_points(self, lgn):
+
+        x = random.randn(5000)
+        y = random.randn(5000)
+        viz = lgn.scatter(x, y, size=random.rand(5000) * 10, max_points=500)
+
+        assert isinstance(viz, Visualization)
+        assert len(viz._indices) <= 500
+        assert viz._original_indices([0, 1]) == [int(i) for i in viz._indices[:2]]
+
+    def test_decimate_scatter(self):
+
+        x = random.randn(10000) * 0.1
+        y = random.randn(10000) * 0.1
+        x[:3] = [50, -40, 30]
+        y[:3] = [50, 40, -30]
+        data = Scatter.clean(x, y, group=ceil(random.rand(10000) * 5), color=[255, 0, 0], max_points=1000)
+
+        assert data['points'].shape[0] <= 1000
+        assert data['group'].shape == (data['points'].shape[0],)
+        assert data['color'].shape == (1, 3)
+        assert list(data['_indices'][:3]) == [0, 1, 2]
+        assert allclose(data['points'], vstack([x, y]).T[data['_indices']])
+        assert '_indices' not in Scatter._format_data(data)
+
+    def test_create_histogram_binned(self, lgn):
+
+        values = random.lognormal(size=100000)
+        viz = lgn.histogram(values, bins='auto', log=True)
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_bin_histogram(self):
+
+        values = random.randn(20000)
+        data = Histogram.clean(values, bins=50)
+        assert data['counts'].sum() == 20000
+        assert data['edges'].shape == (51,)
+
+        data = Histogram.clean(values[:100], bins=10)
+        assert 'values' in data
+
+        data = Histogram.clean(values[:100], bins=10, binned=True)
+        assert data['counts'].shape == (10,)
+
+        with pytest.raises(ValueError):
+            Histogram.clean(abs(values), log=True, binned=False)
+
+    def test_create_histogram2d(self, lgn):
+
+        viz = lgn.histogram2d(random.randn(10000), random.randn(10000), bins=(20, 10))
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_create_force_sparse(self, lgn):
+
+        sparse = pytest.importorskip('scipy.sparse')
+        mat = sparse.random(1000, 1000, density=0.005, format='csr')
+        viz = lgn.force(mat)
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_sparse_links(self):
+
+        sparse = pytest.importorskip('scipy.sparse')
+        mat = random.rand(25, 25)
+        mat[mat < 0.9] = 0
+        expected = mat_to_links(mat)
+
+        for fmt in ['coo', 'csr', 'csc']:
+            links = parse_links(sparse.coo_matrix(mat).asformat(fmt))
+            links = links[lexsort((links[:, 1], links[:, 0]))]
+            assert allclose(links, expected)
+            assert parse_nodes(sparse.coo_matrix(mat).asformat(fmt)) == list(range(25))
+
+        dups = sparse.coo_matrix(([1.0, 2.0, 0.0], ([0, 0, 1], [1, 1, 2])), shape=(3, 3))
+        assert allclose(parse_links(dups), [[0, 1, 3]])
+
+    def test_create_force_edge_list(self, lgn, tmpdir):
+
+        path = str(tmpdir.join('edges.npy'))
+        save(path, random.randint(0, 50, size=(1000, 2)))
+        viz = lgn.force(path)
+
+        assert isinstance(viz, Visualization)
+        assert hasattr(viz, 'id')
+
+    def test_edge_list_chunks(self, tmpdir):
+
+        path = str(tmpdir.join('edges.npy'))
+        edges = random.randint(0, 50, size=(1000, 3))
+        save(path, edges)
+
+        links = EdgeList(path, chunksize=64)
+        assert parse_nodes(path) == list(range(edges[:, :2].max() + 1))
+        assert links.tolist() == edges.astype('float').tolist()
+        assert json.loads(''.join(iter_json({'links': links}))) == {'links': links.tolist()}
+
+    def test_user_data_cache(self, standin):
+
+        lgn = Lightning(standin.start().url, quiet=True)
+        lgn.create_session()
+        viz = lgn.scatter(random.randn(10), random.randn(10))
+        standin.settings = {'selected': [1, 2]}
+
+        def settings_requests():
+            return [r for r in standin.requests if r['path'].endswith('/settings/')]
+
+        viz.set_user_data_cache(max_age=60)
+        assert viz.selected() == [1, 2]
+        viz.points()
+        assert len(settings_requests()) == 1
+        assert 'If-None-Match' not in settings_requests()[0]['headers']
+
+        # revalidated with the ETag, and served from the cache on 304
+        viz.set_user_data_cache(max_age=0)
+        assert viz.selected() == [1, 2]
+        assert len(settings_requests()) == 2
+        assert settings_requests()[1]['headers']['If-None-Match'] == standin.etag
+
+        standin.settings = {'selected': [3]}
+        standin.etag = '"2"'
+        assert viz.selected() == [3]
+
+    def test_update_delta(self, lgn):
+
+        x = random.randn(1000)
+        y = random.randn(1000)
+        viz = lgn.scatter(x, y).enable_delta()
+        methods = []
+        request = lgn.transport.request
+
+        def recording_request(method, url, **kwargs):
+            methods.append((method, kwargs.get('data')))
+            return request(method, url, **kwargs)
+
+        lgn.transport.request = recording_request
+        try:
+            viz.update(x, y)
+            viz.update(x, y)
+            x[10:20] += 1
+            viz.update(x, y)
+        finally:
+            del lgn.transport.request
+
+        assert [method for (method, _) in methods] == ['PUT', 'PATCH']
+        patch = json.loads(methods[1][1])['data']['patch']
+        assert patch['points']['ranges'] == [[10, 20]]
+        assert patch['points']['length'] == 1000
+        assert allclose(patch['points']['rows'], vstack([x, y]).T[10:20])
+
+    def test_update_delta_keyed(self, standin):
+
+        lgn = Lightning(standin.start().url, quiet=True).enable_delta()
+        lgn.create_session()
+        x = random.randn(100)
+        y = random.randn(100)
+        viz = lgn.scatter(x, y)
+
+        class KeyedScatter(Scatter):
+            _data_dict_inputs = {'points': ['x', 'y']}
+
+        # patched rows are keyed like the full data
+        viz.__class__ = KeyedScatter
+        x[:5] += 1
+        viz.update(x, y)
+        patch = json.loads(standin.requests[-1]['body'].decode('utf-8'))['data']['patch']
+        assert standin.requests[-1]['method'] == 'PATCH'
+        assert patch['points']['rows'][0] == {'x': x[0], 'y': y[0]}
+
+        # an update that sends nothing keeps the baseline
+        gallery = lgn.gallery([random.rand(5, 5)]).enable_delta()
+        gallery.update([])
+
+    def test_update_delta_baseline(self, standin):
+
+        lgn = Lightning(standin.start().url, quiet=True).enable_delta()
+        lgn.create_session()
+        x = random.randn(100)
+        y = random.randn(100)
+        viz = lgn.scatterstreaming(x, y)
+        del standin.requests[:]
+
+        # the created data is the baseline, appends reset it
+        x[:5] += 1
+        viz.update(x, y)
+        viz.append(random.randn(5), random.randn(5))
+        viz.update(x, y)
+        assert [method for (method, _) in standin.calls()] == ['PATCH', 'POST', 'PUT']
+
+        # a failed update is not a baseline
+        standin.status['PUT'] = 500
+        viz.update(x * 2, y)
+        del standin.status['PUT']
+        viz.update(x * 2, y)
+        assert [method for (method, _) in standin.calls()][-2:] == ['PUT', 'PUT']
+
+        # a server without patches turns delta updates off
+        standin.status['PATCH'] = 405
+        x[:5] += 1
+        viz.update(x * 2, y)
+        assert [method for (method, _) in standin.calls()][-2:] == ['PATCH', 'PUT']
+        assert viz._delta is None
+
+    def test_changed_ranges(self):
+
+        old = random.randn(100, 3)
+        new = vstack([old, random.randn(5, 3)])
+        new[[3, 4, 50]] += 1
+
+        ranges = changed_ranges(row_fingerprints(old), row_fingerprints(new))
+        assert ranges == [[3, 5], [50, 51], [100, 105]]